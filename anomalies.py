@@ -0,0 +1,268 @@
+import uuid
+
+import numpy as np
+
+from detections import XMIN, YMIN, XMAX, YMAX, CLS, BOX, areas, centers
+from track_store import TrackStore
+
+# Rule bits in FrameAnomalies.flags, one entry per detection
+SUDDEN_APPEARANCE = 1
+RESTRICTED_AREA = 2
+RAPID_MOVEMENT = 4
+UNUSUAL_SIZE = 8
+LOITERING = 16
+
+# Grid cells compared with each point's own cell; the other four neighbours
+# are covered from their side, so every pair of adjacent cells is visited once
+NEIGHBOUR_CELLS = ((0, 0), (1, -1), (1, 0), (1, 1), (0, 1))
+SMALL_SCENE = 40  # Up to this many boxes all pairs are cheaper than binning
+
+
+def inside_area(detections, area):
+    # Boxes strictly inside the (x1, y1, x2, y2) area
+    if not area:
+        return np.zeros(len(detections), dtype=bool)
+    x1, y1, x2, y2 = area
+    return ((detections[:, XMIN] > x1) & (detections[:, YMIN] > y1) &
+            (detections[:, XMAX] < x2) & (detections[:, YMAX] < y2))
+
+
+def close_pairs(points, radius):
+    # Index pairs of points closer than radius, with their distances. In
+    # larger scenes points are binned into radius-sized grid cells, so only
+    # boxes in the same or an adjacent cell are compared instead of all
+    # n * (n - 1) / 2 pairs.
+    empty = np.zeros(0, dtype=np.int64)
+    if len(points) < 2 or radius <= 0:
+        return empty, empty, np.zeros(0)
+    if len(points) <= SMALL_SCENE:
+        first, second = np.triu_indices(len(points), 1)
+    else:
+        first, second = grid_candidates(points, radius)
+    distances = np.linalg.norm(points[first] - points[second], axis=1)
+    close = distances < radius
+    return first[close], second[close], distances[close]
+
+
+def grid_candidates(points, radius):
+    # Candidate pairs from the same and adjacent radius-sized cells
+    cells = np.floor(points / radius).astype(np.int64)
+    cells -= cells.min(axis=0) - 1  # Keeps the neighbour keys from wrapping into another column
+    rows = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0] * rows + cells[:, 1]
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    firsts, seconds = [], []
+    for dx, dy in NEIGHBOUR_CELLS:
+        neighbour = keys + dx * rows + dy
+        start = np.searchsorted(sorted_keys, neighbour, 'left')
+        counts = np.searchsorted(sorted_keys, neighbour, 'right') - start
+        total = int(counts.sum())
+        if not total:
+            continue
+        # Every point against every point of its neighbour cell
+        first = np.repeat(np.arange(len(points)), counts)
+        offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = order[np.repeat(start, counts) + offsets]
+        if dx == 0 and dy == 0:
+            same = first < second
+            first, second = first[same], second[same]
+        firsts.append(first)
+        seconds.append(second)
+    if not firsts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def pair_keys(ids_a, ids_b):
+    # One int64 per unordered pair of track ids
+    return np.minimum(ids_a, ids_b).astype(np.int64) << 32 | np.maximum(ids_a, ids_b).astype(np.int64)
+
+
+class ClosedEvents:
+    # Events that ended on a frame, as parallel arrays
+    def __init__(self, keys, event_ids, end_times, durations, end_frames, peak_severity, peak_values):
+        self.keys = keys
+        self.event_ids = event_ids
+        self.end_times = end_times  # time.time() of the last frame the condition held
+        self.durations = durations  # Seconds since the first frame it held
+        self.end_frames = end_frames
+        self.peak_severity = peak_severity
+        self.peak_values = peak_values
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class EventTable:
+    # Anomaly events of one kind, keyed by an int64 (a track id, or pair_keys
+    # for interactions) and kept as sorted parallel arrays. A key's condition
+    # has to hold on min_frames frames before its event starts, and the event
+    # ends only after the condition has been false for more than `gap`
+    # processed frames, so a condition that lasts or flickers is one event
+    # with a start and an end instead of a row on every frame.
+    def __init__(self):
+        self.keys = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)  # Condition held on min_frames frames: the event has started
+        self.event_ids = np.zeros(0, dtype=object)
+        self.last_seen = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)  # Frames the condition held
+        self.start_time = np.zeros(0)
+        self.last_time = np.zeros(0)
+        self.peak_severity = np.zeros(0, dtype=np.int64)
+        self.peak_values = np.zeros(0)
+        self.started = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def keep(self, index):
+        self.keys = self.keys[index]
+        self.active = self.active[index]
+        self.event_ids = self.event_ids[index]
+        self.last_seen = self.last_seen[index]
+        self.hits = self.hits[index]
+        self.start_time = self.start_time[index]
+        self.last_time = self.last_time[index]
+        self.peak_severity = self.peak_severity[index]
+        self.peak_values = self.peak_values[index]
+
+    def closed(self, rows):
+        rows = rows[self.active[rows]]
+        return ClosedEvents(self.keys[rows], self.event_ids[rows], self.last_time[rows],
+                            self.last_time[rows] - self.start_time[rows], self.last_seen[rows], self.peak_severity[rows], self.peak_values[rows])
+
+    def update(self, keys, frame_count, now, severity, values=None, min_frames=1, gap=10):
+        # keys: the keys whose condition holds on this frame. Returns a mask of
+        # the keys whose event starts now, the ids of those events, and the
+        # events that ended.
+        keys = np.asarray(keys, dtype=np.int64)
+        severity = np.broadcast_to(np.asarray(severity, dtype=np.int64), keys.shape)
+        values = np.full(len(keys), np.nan) if values is None else np.asarray(values, dtype=np.float64)
+
+        expired = frame_count - self.last_seen > gap
+        ended = self.closed(np.flatnonzero(expired))
+        if expired.any():
+            self.keep(~expired)
+
+        rows = np.searchsorted(self.keys, keys)
+        known = rows < len(self.keys)
+        known[known] = self.keys[rows[known]] == keys[known]
+        new = ~known
+        if new.any():
+            count = int(new.sum())
+            self.keys = np.concatenate((self.keys, keys[new]))
+            self.active = np.concatenate((self.active, np.zeros(count, dtype=bool)))
+            self.event_ids = np.concatenate((self.event_ids, np.full(count, None, dtype=object)))
+            self.last_seen = np.concatenate((self.last_seen, np.full(count, frame_count, dtype=np.int64)))
+            self.hits = np.concatenate((self.hits, np.zeros(count, dtype=np.int64)))
+            self.start_time = np.concatenate((self.start_time, np.full(count, now)))
+            self.last_time = np.concatenate((self.last_time, np.full(count, now)))
+            self.peak_severity = np.concatenate((self.peak_severity, np.zeros(count, dtype=np.int64)))
+            self.peak_values = np.concatenate((self.peak_values, np.full(count, np.nan)))
+            self.keep(np.argsort(self.keys, kind='stable'))
+            rows = np.searchsorted(self.keys, keys)
+
+        self.last_seen[rows] = frame_count
+        self.last_time[rows] = now
+        self.hits[rows] += 1
+        self.peak_severity[rows] = np.maximum(self.peak_severity[rows], severity)
+        self.peak_values[rows] = np.fmax(self.peak_values[rows], values)
+
+        starting = ~self.active[rows] & (self.hits[rows] >= min_frames)
+        self.active[rows[starting]] = True
+        for row in rows[starting]:
+            self.event_ids[row] = uuid.uuid4().hex
+        self.started += int(starting.sum())
+        return starting, self.event_ids[rows[starting]], ended
+
+    def close_all(self):
+        ended = self.closed(np.arange(len(self.keys)))
+        self.keep(np.zeros(len(self.keys), dtype=bool))
+        return ended
+
+
+class FrameAnomalies:
+    # What the rules found on one frame: a bit mask per detection plus the
+    # measured values the log messages need, and the tracks that just vanished
+    def __init__(self, flags, dwell, movement, loitering, disappeared_ids, disappeared_classes):
+        self.flags = flags
+        self.dwell = dwell  # Seconds in the restricted area, nan outside
+        self.movement = movement  # Pixels since the object's last frame, nan for new objects
+        self.loitering = loitering  # Seconds a person has been around, nan otherwise
+        self.disappeared_ids = disappeared_ids
+        self.disappeared_classes = disappeared_classes
+
+    def __len__(self):
+        return len(self.flags)
+
+    def any(self):
+        return bool(self.flags.any()) or len(self.disappeared_ids) > 0
+
+
+class AnomalyRules:
+    # Evaluates every rule as a handful of NumPy operations over all boxes of
+    # a frame, against the per-track timers and box history in a TrackStore.
+    # A track keeps its slot until the tracker drops its id (removed_ids), so
+    # one that is missed for a few frames comes back with its timers.
+    def __init__(self, history=30):
+        self.tracks = TrackStore(history=history)
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def evaluate(self, detections, track_ids, frame_count, now, frame_area, restricted_area, person_class,
+                 appearance_frames, zone_seconds, movement_pixels, loitering_seconds, removed_ids=()):
+        # removed_ids: ids the tracker dropped on this frame (MultiObjectTracker.removed_ids)
+        tracks = self.tracks
+        slots = tracks.slots_for(track_ids, detections[:, CLS], frame_count)
+        flags = np.zeros(len(detections), dtype=np.uint8)
+
+        # Tracks first seen within the last appearance_frames frames
+        flags[frame_count - tracks.first_seen[slots] <= appearance_frames] |= SUDDEN_APPEARANCE
+
+        # Dwell time in the restricted area, counted from the frame the box got inside
+        inside = inside_area(detections, restricted_area)
+        entered = tracks.zone_entered[slots]
+        entered[inside & np.isnan(entered)] = now
+        entered[~inside] = np.nan
+        tracks.zone_entered[slots] = entered
+        dwell = now - entered
+        flags[dwell > zone_seconds] |= RESTRICTED_AREA
+
+        # Centre distance to the same track's box on the last frame it was seen
+        previous = tracks.previous_boxes(slots)
+        movement = np.linalg.norm(centers(detections) - (previous[:, :2] + previous[:, 2:]) / 2, axis=1)
+        flags[movement > movement_pixels] |= RAPID_MOVEMENT
+
+        flags[areas(detections) > frame_area / 4] |= UNUSUAL_SIZE
+
+        # People start a loitering timer on their first frame; it fires from the next one on
+        person = detections[:, CLS] == person_class
+        started = tracks.loitering_start[slots]
+        loitering = np.where(person, now - started, np.nan)
+        started[person & np.isnan(started)] = now
+        started[~person] = np.nan
+        tracks.loitering_start[slots] = started
+        flags[loitering > loitering_seconds] |= LOITERING
+
+        tracks.last_seen[slots] = frame_count
+        tracks.push_boxes(slots, detections[:, BOX])
+        missing = self.disappeared(frame_count, appearance_frames)
+        result = FrameAnomalies(flags, dwell, movement, loitering, tracks.ids[missing], tracks.classes[missing])
+        self.release(removed_ids)
+        return result
+
+    def disappeared(self, frame_count, appearance_frames):
+        # Slots of tracks last seen 1 to appearance_frames frames ago
+        live = self.tracks.live_slots()
+        unseen = frame_count - self.tracks.last_seen[live]
+        return live[(unseen > 0) & (unseen <= appearance_frames)]
+
+    def release(self, track_ids):
+        # Frees the slots of tracks that will not come back
+        slots = self.tracks.lookup(np.asarray(track_ids, dtype=np.int64))
+        slots = slots[slots >= 0]
+        if len(slots):
+            self.tracks.release(slots)
@@ -0,0 +1,284 @@
+import ast
+import json
+import os
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+
+from detections import empty_detections, from_results
+from model_cache import OPTIMIZATIONS, cached_artifact, quantize_onnx, trace_torchscript
+
+try:
+    import torch
+except ImportError:  # ONNX Runtime / OpenCV deployments don't need PyTorch
+    torch = None
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+# Every backend takes a list of RGB frames at their source resolution,
+# letterboxes them to a fixed square input_size and returns one N x 6
+# detection array per frame in that frame's pixel coordinates, so the engine
+# does not care which one is running or what resolution it infers at.
+# set_filter(class_ids, conf) makes a backend drop other classes and lower
+# scores before NMS, so unwanted boxes never reach the engine.
+BACKENDS = ('torch', 'onnxruntime', 'opencv')
+DEFAULT_BACKEND = 'torch'
+# Weights and the YOLOv5 code are looked up locally first so startup works offline
+DEFAULT_WEIGHTS = {
+    'torch': os.path.join('models', 'yolov5s.pt'),
+    'onnxruntime': os.path.join('models', 'yolov5s.onnx'),
+    'opencv': os.path.join('models', 'yolov5s.onnx'),
+}
+HUB_REPO = 'ultralytics/yolov5'
+
+COCO_NAMES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat', 'traffic light',
+    'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog', 'horse', 'sheep', 'cow',
+    'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella', 'handbag', 'tie', 'suitcase', 'frisbee',
+    'skis', 'snowboard', 'sports ball', 'kite', 'baseball bat', 'baseball glove', 'skateboard', 'surfboard',
+    'tennis racket', 'bottle', 'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple',
+    'sandwich', 'orange', 'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch',
+    'potted plant', 'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote', 'keyboard',
+    'cell phone', 'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book', 'clock', 'vase',
+    'scissors', 'teddy bear', 'hair drier', 'toothbrush',
+]
+
+
+def local_repo_dir(repo_dir=None):
+    if repo_dir and os.path.isdir(repo_dir):
+        return repo_dir
+    # torch.hub keeps its own checkout after the first online load
+    cached = os.path.join(torch.hub.get_dir(), HUB_REPO.replace('/', '_') + '_master')
+    if os.path.isdir(cached):
+        return cached
+    return None
+
+
+def load_torch_model(weights, repo_dir=None):
+    repo = local_repo_dir(repo_dir)
+    if os.path.exists(weights):
+        if repo is not None:
+            return torch.hub.load(repo, 'custom', path=weights, source='local')
+        return torch.hub.load(HUB_REPO, 'custom', path=weights)
+    # No local weights yet: download them once, as before
+    print(f"Model weights not found at {weights}; downloading yolov5s")
+    if repo is not None:
+        return torch.hub.load(repo, 'yolov5s', pretrained=True, source='local')
+    return torch.hub.load(HUB_REPO, 'yolov5s', pretrained=True)
+
+
+class TorchBackend:
+    # The YOLOv5 torch.hub AutoShape model; it letterboxes, runs NMS and maps
+    # boxes back to the input frames itself
+    name = 'torch'
+    resizable = True  # AutoShape takes the inference size per call
+
+    def __init__(self, weights, repo_dir=None, input_size=640):
+        if torch is None:
+            raise RuntimeError("PyTorch is required for the torch backend (pip install torch)")
+        self.weights = weights
+        self.input_size = input_size
+        self.model = load_torch_model(weights, repo_dir)
+        self.names = getattr(self.model, 'names', None) or {}
+
+    def set_filter(self, class_ids, conf):
+        # AutoShape passes both straight to non_max_suppression
+        if self.model is not None:
+            self.model.classes = None if class_ids is None else [int(c) for c in class_ids]
+            self.model.conf = conf
+
+    def detect(self, frames, size=None):
+        if self.model is None:
+            return [empty_detections() for _ in frames]
+        results = self.model(frames, size=size or self.input_size)
+        return [from_results(results, i) for i in range(len(frames))]
+
+
+def letterbox(frame, size):
+    # Scale to fit size x size keeping the aspect ratio, pad the rest with gray
+    height, width = frame.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    pad_x, pad_y = (size - new_width) / 2, (size - new_height) / 2
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+    top, left = round(pad_y - 0.1), round(pad_x - 0.1)
+    bottom, right = size - new_height - top, size - new_width - left
+    frame = cv2.copyMakeBorder(frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return frame, ratio, (left, top)
+
+
+class ExportedYoloBackend(ABC):
+    # Shared pre/post-processing for a YOLOv5 model exported to ONNX
+    # (python export.py --include onnx): a 1x3xSxS float input and a
+    # 1 x boxes x (5 + classes) output of [cx, cy, w, h, objectness, scores...]
+    name = None
+    resizable = False  # The exported graph has a fixed input size
+    max_detections = 300
+
+    def __init__(self, weights, input_size=640, conf=0.25, iou=0.45):
+        if not os.path.exists(weights):
+            raise FileNotFoundError(f"Exported model not found: {weights}")
+        self.weights = weights
+        self.input_size = input_size
+        self.conf = conf
+        self.iou = iou
+        self.classes = None  # Class ids kept by postprocess, all when None
+        self.names = dict(enumerate(COCO_NAMES))
+
+    def set_filter(self, class_ids, conf):
+        self.classes = None if class_ids is None else np.asarray(class_ids, dtype=int)
+        self.conf = conf
+
+    def preprocess(self, frame):
+        image, ratio, pad = letterbox(frame, self.input_size)
+        blob = cv2.dnn.blobFromImage(image, 1 / 255.0)  # HWC uint8 -> 1xCxHxW float32
+        return blob, ratio, pad
+
+    def postprocess(self, output, ratio, pad, frame_shape):
+        output = output.reshape(-1, output.shape[-1])
+        output = output[output[:, 4] > self.conf]
+        if not len(output):
+            return empty_detections()
+        scores = output[:, 5:] * output[:, 4:5]
+        classes = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), classes]
+        keep = confidences > self.conf
+        if self.classes is not None:
+            keep &= np.isin(classes, self.classes)
+        output, classes, confidences = output[keep], classes[keep], confidences[keep]
+        if not len(output):
+            return empty_detections()
+
+        boxes = np.empty((len(output), 4), dtype=np.float32)
+        boxes[:, 0] = output[:, 0] - output[:, 2] / 2
+        boxes[:, 1] = output[:, 1] - output[:, 3] / 2
+        boxes[:, 2] = output[:, 2]
+        boxes[:, 3] = output[:, 3]
+        indices = cv2.dnn.NMSBoxesBatched(boxes.tolist(), confidences.tolist(), classes.tolist(),
+                                          self.conf, self.iou)
+        indices = np.asarray(indices, dtype=int).reshape(-1)[:self.max_detections]
+
+        detections = np.empty((len(indices), 6), dtype=np.float32)
+        detections[:, 0] = boxes[indices, 0]
+        detections[:, 1] = boxes[indices, 1]
+        detections[:, 2] = boxes[indices, 0] + boxes[indices, 2]
+        detections[:, 3] = boxes[indices, 1] + boxes[indices, 3]
+        detections[:, 4] = confidences[indices]
+        detections[:, 5] = classes[indices]
+
+        # Back from the letterboxed input to frame pixels
+        detections[:, [0, 2]] = ((detections[:, [0, 2]] - pad[0]) / ratio).clip(0, frame_shape[1])
+        detections[:, [1, 3]] = ((detections[:, [1, 3]] - pad[1]) / ratio).clip(0, frame_shape[0])
+        return detections
+
+    @abstractmethod
+    def infer(self, blob):
+        # (1, boxes, 5 + classes) raw output for a letterboxed NCHW blob
+        pass
+
+    def detect(self, frames, size=None):
+        results = []
+        for frame in frames:
+            blob, ratio, pad = self.preprocess(frame)
+            results.append(self.postprocess(self.infer(blob), ratio, pad, frame.shape))
+        return results
+
+
+class OnnxRuntimeBackend(ExportedYoloBackend):
+    name = 'onnxruntime'
+
+    def __init__(self, weights, input_size=640, conf=0.25, iou=0.45, threads=0):
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime is required for the onnxruntime backend (pip install onnxruntime)")
+        super().__init__(weights, input_size, conf, iou)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(weights, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        # YOLOv5 exports store the class names in the model metadata
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        if names:
+            self.names = {int(k): v for k, v in ast.literal_eval(names).items()}
+
+    def infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+
+class OpenCVBackend(ExportedYoloBackend):
+    name = 'opencv'
+
+    def __init__(self, weights, input_size=640, conf=0.25, iou=0.45):
+        super().__init__(weights, input_size, conf, iou)
+        self.net = cv2.dnn.readNetFromONNX(weights)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def infer(self, blob):
+        self.net.setInput(blob)
+        return self.net.forward()
+
+
+class TorchScriptBackend(ExportedYoloBackend):
+    # The YOLOv5 network traced at a fixed square input and frozen; same
+    # letterbox/NMS path as the ONNX backends, no Python module code per frame
+    name = 'torchscript'
+
+    def __init__(self, weights, input_size=640, conf=0.25, iou=0.45):
+        super().__init__(weights, input_size, conf, iou)
+        extra_files = {'names.json': ''}
+        self.module = torch.jit.load(weights, map_location='cpu', _extra_files=extra_files)
+        if extra_files['names.json']:
+            self.names = {int(k): v for k, v in json.loads(extra_files['names.json']).items()}
+
+    def infer(self, blob):
+        with torch.inference_mode():
+            output = self.module(torch.from_numpy(blob))
+        if isinstance(output, (list, tuple)):
+            output = output[0]
+        return output.numpy()
+
+
+def create_backend(backend=None, weights=None, repo_dir=None, input_size=640, optimization='none'):
+    backend = backend or DEFAULT_BACKEND
+    optimization = optimization or 'none'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown detector backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    if optimization not in OPTIMIZATIONS:
+        raise ValueError(f"Unknown model optimization '{optimization}', expected one of {', '.join(OPTIMIZATIONS)}")
+    weights = weights or DEFAULT_WEIGHTS[backend]
+
+    if backend == 'torch' and optimization == 'torchscript':
+        if torch is None:
+            raise RuntimeError("PyTorch is required for the torch backend (pip install torch)")
+        if not os.path.exists(weights):
+            raise FileNotFoundError(f"TorchScript conversion needs local weights: {weights}")
+        options = {'input_size': input_size, 'torch': torch.__version__}
+        traced = cached_artifact(weights, optimization, options, '.torchscript',
+                                 lambda source, target: trace_torchscript(load_torch_model(source, repo_dir),
+                                                                          target, input_size))
+        return TorchScriptBackend(traced, input_size)
+    if backend == 'onnxruntime' and optimization == 'int8':
+        if onnxruntime is None:
+            raise RuntimeError("onnxruntime is required for the onnxruntime backend (pip install onnxruntime)")
+        if not os.path.exists(weights):
+            raise FileNotFoundError(f"Exported model not found: {weights}")
+        options = {'weight_type': 'QUInt8', 'onnxruntime': onnxruntime.__version__}
+        return OnnxRuntimeBackend(cached_artifact(weights, optimization, options, '.onnx', quantize_onnx), input_size)
+    if optimization != 'none':
+        # PyTorch dynamic quantization only covers Linear/RNN layers, and the
+        # YOLOv5 network is convolutions, so INT8 goes through ONNX Runtime
+        raise ValueError(f"Optimization '{optimization}' is not available for the {backend} backend "
+                         "(use torchscript with torch, int8 with onnxruntime)")
+
+    if backend == 'torch':
+        return TorchBackend(weights, repo_dir, input_size)
+    if backend == 'onnxruntime':
+        return OnnxRuntimeBackend(weights, input_size)
+    return OpenCVBackend(weights, input_size)
@@ -0,0 +1,75 @@
+# Per-frame CPU latency of each detector backend on the same frames.
+#
+#   python benchmarks/bench_backends.py [--video clip.mp4] [--frames 100]
+#       [--torch-weights models/yolov5s.pt] [--onnx-weights models/yolov5s.onnx]
+#
+# The ONNX file comes from the YOLOv5 repository:
+#   python export.py --weights yolov5s.pt --include onnx
+# Backends whose package or weights file is missing are reported and skipped,
+# so the script can be run as-is on every deployment box to pick model_backend.
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import BACKENDS, DEFAULT_WEIGHTS, create_backend  # noqa: E402
+from detections import CONF  # noqa: E402
+from model_loader import warm_up  # noqa: E402
+
+
+def load_frames(video, count, size):
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(video)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(cv2.cvtColor(cv2.resize(frame, size), cv2.COLOR_BGR2RGB))
+        cap.release()
+    if not frames:
+        rng = np.random.default_rng(0)
+        frames = [rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8) for _ in range(count)]
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare detector backends on CPU.")
+    parser.add_argument("--video", help="Video to take frames from (random frames otherwise)")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("--size", default="800x600", help="Frame size as WIDTHxHEIGHT")
+    parser.add_argument("--torch-weights", default=DEFAULT_WEIGHTS['torch'])
+    parser.add_argument("--onnx-weights", default=DEFAULT_WEIGHTS['onnxruntime'])
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.lower().split("x"))
+    frames = load_frames(args.video, args.frames, (width, height))
+    weights = {'torch': args.torch_weights, 'onnxruntime': args.onnx_weights, 'opencv': args.onnx_weights}
+
+    print(f"{len(frames)} frames at {width}x{height}")
+    baseline = None
+    for name in BACKENDS:
+        try:
+            backend = create_backend(name, weights[name])
+            warm_up(backend, (width, height))
+        except Exception as e:
+            print(f"{name:12s} skipped: {str(e)}")
+            continue
+
+        start = time.perf_counter()
+        detections = [backend.detect([frame])[0] for frame in frames]
+        elapsed = (time.perf_counter() - start) / len(frames)
+        baseline = baseline or elapsed
+        boxes = sum(len(d) for d in detections)
+        mean_conf = np.mean([d[:, CONF].mean() for d in detections if len(d)]) if boxes else 0.0
+        print(f"{name:12s} {elapsed * 1000:7.1f} ms/frame  {1 / elapsed:6.1f} FPS  "
+              f"{baseline / elapsed:4.2f}x vs first  {boxes} boxes, mean conf {mean_conf:.2f}")
+
+
+if __name__ == "__main__":
+    main()
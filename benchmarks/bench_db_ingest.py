@@ -0,0 +1,69 @@
+# Detection ingestion rate of per-row inserts vs the batched background writer.
+#
+#   python benchmarks/bench_db_ingest.py [rows]
+#
+# "per-row" is the old path: one connection, one INSERT and one commit per
+# detection. "batched" queues the same rows on DatabaseWriter, which inserts
+# them with executemany on one WAL connection; the time includes the final
+# flush, so every row is on disk when the clock stops.
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DETECTION_INSERT, DatabaseManager, to_ms  # noqa: E402
+
+
+def make_rows(count):
+    now = datetime.now()
+    return [(now.isoformat(), to_ms(now), 'cam0', 'person', 0.8, 10, 20, 110, 220, index) for index in range(count)]
+
+
+def per_row(db_path, rows):
+    manager = DatabaseManager(db_path)
+    manager.setup_database(background_migration=False)
+    start = time.perf_counter()
+    for row in rows:
+        manager.write_row(DETECTION_INSERT, row)
+    return time.perf_counter() - start
+
+
+def batched(db_path, rows):
+    manager = DatabaseManager(db_path)
+    manager.setup_database(background_migration=False)
+    writer = manager.start_writer()
+    start = time.perf_counter()
+    for row in rows:
+        manager.write_row(DETECTION_INSERT, row)
+    enqueue_time = time.perf_counter() - start
+    manager.stop_writer()
+    total_time = time.perf_counter() - start
+    return enqueue_time, total_time, writer
+
+
+def count_rows(db_path):
+    with DatabaseManager(db_path).get_connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM detections').fetchone()[0]
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rows = make_rows(count)
+    with tempfile.TemporaryDirectory() as folder:
+        old_path = os.path.join(folder, 'per_row.db')
+        old_time = per_row(old_path, rows)
+        print(f"per-row:  {count} rows in {old_time:.2f} s, {count / old_time:,.0f} detections/s")
+
+        new_path = os.path.join(folder, 'batched.db')
+        enqueue_time, new_time, writer = batched(new_path, rows)
+        print(f"batched:  {count} rows in {new_time:.2f} s, {count / new_time:,.0f} detections/s "
+              f"(enqueue {enqueue_time * 1000:.1f} ms, {writer.flushes} flushes, "
+              f"{writer.dropped_detections} dropped)")
+        print(f"speed-up: {old_time / new_time:.1f}x, rows on disk: {count_rows(old_path)} / {count_rows(new_path)}")
+
+
+if __name__ == "__main__":
+    main()
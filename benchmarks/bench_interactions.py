@@ -0,0 +1,88 @@
+# Pairwise interaction search in crowded scenes: the double loop over all
+# pairs vs the grid in anomalies.close_pairs, and how many interactions get
+# logged with and without per-pair events.
+#
+#   python benchmarks/bench_interactions.py [--counts 10 50 100 200 500] [--frames 100]
+#
+# People walk around a 1920x1080 frame in loose groups with stable track
+# ids. "logged" counts what the old code wrote (one row per close pair per
+# frame) against the interaction events an EventTable starts.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anomalies import EventTable, close_pairs, pair_keys  # noqa: E402
+from detections import centers  # noqa: E402
+
+FRAME_SIZE = (1920, 1080)
+DISTANCE = 50  # interaction_distance_threshold
+
+
+def simulate(count, frames, seed=0):
+    # Groups of about five people wandering together, each with some jitter
+    rng = np.random.default_rng(seed)
+    width, height = FRAME_SIZE
+    groups = max(1, count // 5)
+    group_positions = rng.uniform((100, 100), (width - 100, height - 100), (groups, 2))
+    group_velocities = rng.uniform(-3, 3, (groups, 2))
+    members = rng.integers(0, groups, count)
+    offsets = rng.normal(0, 40, (count, 2))
+    sizes = rng.uniform((30, 80), (50, 120), (count, 2))
+    sequence = []
+    for _ in range(frames):
+        group_positions = np.clip(group_positions + group_velocities, 100, (width - 100, height - 100))
+        offsets += rng.normal(0, 2, (count, 2))
+        center = group_positions[members] + offsets
+        detections = np.hstack((center - sizes / 2, center + sizes / 2, np.full((count, 1), 0.9),
+                                np.zeros((count, 1)))).astype(np.float32)
+        sequence.append(detections)
+    return sequence
+
+
+def all_pairs(detections):
+    # The old search: every pair, one distance at a time
+    found = 0
+    points = centers(detections).tolist()
+    for i in range(len(points)):
+        for j in range(i + 1, len(points)):
+            x1, y1 = points[i]
+            x2, y2 = points[j]
+            if ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5 < DISTANCE:
+                found += 1
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grid vs all-pairs interaction search.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 50, 100, 200, 500])
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'people':>6} | {'all pairs (ms)':>14} | {'grid (ms)':>9} | {'speed-up':>8} | "
+          f"{'close pairs/frame':>17} | {'logged before':>13} | {'logged now':>10}")
+    for count in args.counts:
+        sequence = simulate(count, args.frames)
+        ids = np.arange(1, count + 1)
+
+        start = time.perf_counter()
+        logged_before = sum(all_pairs(detections) for detections in sequence)
+        loop_ms = (time.perf_counter() - start) / len(sequence) * 1000
+
+        events = EventTable()
+        start = time.perf_counter()
+        for frame_count, detections in enumerate(sequence, 1):
+            first, second, _ = close_pairs(centers(detections), DISTANCE)
+            events.update(pair_keys(ids[first], ids[second]), frame_count, time.time(), 1)
+        grid_ms = (time.perf_counter() - start) / len(sequence) * 1000
+
+        print(f"{count:>6} | {loop_ms:>14.3f} | {grid_ms:>9.3f} | {loop_ms / grid_ms:>7.1f}x | "
+              f"{logged_before / len(sequence):>17.1f} | {logged_before:>13} | {events.started:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# Detector time and anomaly recall of keyframe mode against running the
+# detector on every frame.
+#
+#   python benchmarks/bench_keyframes.py [--intervals 3 5 8] [--frames 300]
+#   python benchmarks/bench_keyframes.py --video clip.mp4 [--backend torch] [--weights models/yolov5s.pt]
+#
+# Without --video a textured clip with moving objects is rendered and an
+# oracle detector returns the true boxes after --detector-ms of simulated
+# work, so the script runs without model weights. With --video the chosen
+# backend is used. Each run drives DetectionEngine.process_frame with
+# anomaly detection on; boxes and anomalies from keyframe mode are compared
+# with the every-frame run: box recall (same class, IoU >= 0.5), mean IoU,
+# and per anomaly type the share of every-frame anomalies that keyframe mode
+# also raised within two frames.
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import BACKENDS, create_backend  # noqa: E402
+from detections import BOX, CLS  # noqa: E402
+from engine import DetectionEngine  # noqa: E402
+from tracker import assign, iou_matrix  # noqa: E402
+
+
+class AnomalyRecorder:
+    # Stands in for DatabaseManager: keeps the anomalies instead of writing them
+    def __init__(self):
+        self.anomalies = []
+
+    def log_detection(self, *args, **kwargs):
+        pass
+
+    def log_anomaly(self, anomaly_type, description, box, frame_number, severity=1, camera_id=None, event_id=None):
+        self.anomalies.append((anomaly_type, frame_number))
+
+    def close_anomaly(self, *args, **kwargs):
+        pass
+
+
+class OracleDetector:
+    # Returns the rendered boxes of the current frame
+    name = 'oracle'
+    names = {0: 'person', 2: 'car'}
+
+    def __init__(self, truth, seconds):
+        self.truth = truth
+        self.seconds = seconds
+        self.index = 0
+
+    def detect(self, frames, size=None):
+        time.sleep(self.seconds)
+        return [self.truth[self.index].copy() for _ in frames]
+
+
+class TimedDetector:
+    def __init__(self, model):
+        self.model = model
+        self.names = getattr(model, 'names', {})
+        self.calls = 0
+        self.seconds = 0.0
+
+    def detect(self, frames, size=None):
+        start = time.perf_counter()
+        detections = self.model.detect(frames, size)
+        self.seconds += time.perf_counter() - start
+        self.calls += 1
+        return detections
+
+
+def render_clip(count, size=(640, 480), objects=6, seed=0):
+    # Textured background and textured boxes moving at constant speed, bouncing off the edges
+    rng = np.random.default_rng(seed)
+    width, height = size
+    background = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 3)
+    boxes = []
+    for i in range(objects):
+        w, h = (60, 120) if i % 3 else (120, 70)
+        boxes.append({
+            'size': np.array([w, h], dtype=np.float64),
+            'position': rng.uniform((0, 0), (width - w, height - h)),
+            'velocity': rng.uniform(-6, 6, 2) * (3 if i == 0 else 1),
+            'texture': cv2.GaussianBlur(rng.integers(0, 255, (h, w, 3), dtype=np.uint8), (0, 0), 1.5),
+            'class': 0 if i % 3 else 2,
+        })
+    frames, truth = [], []
+    for _ in range(count):
+        frame = background.copy()
+        rows = []
+        for box in boxes:
+            box['position'] += box['velocity']
+            for axis, limit in ((0, width), (1, height)):
+                if not 0 <= box['position'][axis] <= limit - box['size'][axis]:
+                    box['velocity'][axis] *= -1
+                    box['position'][axis] = np.clip(box['position'][axis], 0, limit - box['size'][axis])
+            x, y = box['position'].astype(int)
+            w, h = box['size'].astype(int)
+            frame[y:y + h, x:x + w] = box['texture']
+            rows.append([x, y, x + w, y + h, 0.9, box['class']])
+        frames.append(frame)
+        truth.append(np.array(rows, dtype=np.float32))
+    return frames, truth
+
+
+def load_clip(video, count):
+    frames = []
+    cap = cv2.VideoCapture(video)
+    while len(frames) < count:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    cap.release()
+    return frames
+
+
+def run(frames, detector, interval, oracle=None):
+    recorder = AnomalyRecorder()
+    engine = DetectionEngine(recordings_folder=tempfile.mkdtemp(), db_manager=recorder)
+    engine.model = detector
+    engine.detection_classes = ['person', 'car']
+    engine.motion_gate_enabled = False  # Measure keyframes on their own
+    engine.anomaly_detection_enabled = True
+    engine.anomaly_threshold_time = 0
+    engine.keyframe_interval = interval
+    height, width = frames[0].shape[:2]
+    engine.restricted_area = (width // 4, height // 4, 3 * width // 4, 3 * height // 4)
+    engine.start_source(30)
+    boxes = []
+    start = time.perf_counter()
+    try:
+        for index, frame in enumerate(frames):
+            if oracle is not None:
+                oracle.index = index
+            _, detections = engine.process_frame(frame, annotate=False)
+            boxes.append(detections)
+    finally:
+        engine.close()
+    return boxes, recorder.anomalies, time.perf_counter() - start, engine.propagator.propagate_time
+
+
+def box_agreement(reference, candidate):
+    matched, total_iou, total = 0, 0.0, 0
+    for expected, found in zip(reference, candidate):
+        total += len(expected)
+        if not len(expected) or not len(found):
+            continue
+        iou = iou_matrix(expected[:, BOX].astype(np.float64), found[:, BOX].astype(np.float64))
+        iou[expected[:, None, CLS] != found[None, :, CLS]] = 0.0
+        rows, cols = assign(1.0 - iou)
+        keep = iou[rows, cols] >= 0.5
+        matched += keep.sum()
+        total_iou += iou[rows[keep], cols[keep]].sum()
+    return (matched / total if total else 1.0), (total_iou / matched if matched else 0.0)
+
+
+def anomaly_recall(reference, candidate, tolerance=2):
+    found = defaultdict(set)
+    for anomaly_type, frame in candidate:
+        found[anomaly_type].add(frame)
+    recall = {}
+    for anomaly_type in sorted({anomaly_type for anomaly_type, _ in reference}):
+        expected = {frame for kind, frame in reference if kind == anomaly_type}
+        hits = sum(any(frame + d in found[anomaly_type] for d in range(-tolerance, tolerance + 1))
+                   for frame in expected)
+        recall[anomaly_type] = hits / len(expected)
+    return recall
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyframe detection with optical-flow propagation vs every frame.")
+    parser.add_argument("--video", help="Clip to run on (a rendered clip with an oracle detector otherwise)")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--intervals", type=int, nargs="+", default=[3, 5, 8])
+    parser.add_argument("--backend", choices=BACKENDS, default='torch')
+    parser.add_argument("--weights")
+    parser.add_argument("--detector-ms", type=float, default=40.0, help="Simulated detector time for the rendered clip")
+    args = parser.parse_args()
+
+    oracle = None
+    if args.video:
+        frames = load_clip(args.video, args.frames)
+        model = create_backend(args.backend, args.weights)
+    else:
+        frames, truth = render_clip(args.frames)
+        frames = [cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) for frame in frames]
+        model = oracle = OracleDetector(truth, args.detector_ms / 1000)
+    if not frames:
+        print(f"No frames read from {args.video}")
+        return
+
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames at {width}x{height}")
+    detector = TimedDetector(model)
+    reference, reference_anomalies, reference_time, _ = run(frames, detector, 1, oracle)
+    reference_calls, reference_seconds = detector.calls, detector.seconds
+    print(f"{'interval':>8s} {'detector calls':>15s} {'detector s':>11s} {'saved':>7s} {'flow ms/frame':>14s} "
+          f"{'total s':>8s} {'box recall':>11s} {'mean IoU':>9s}  anomaly recall")
+    print(f"{1:8d} {reference_calls:15d} {reference_seconds:11.2f} {1.0:6.1f}x {0.0:14.2f} {reference_time:8.2f} "
+          f"{1.0:11.3f} {1.0:9.3f}  " + ", ".join(f"{kind} {len([a for a in reference_anomalies if a[0] == kind])}"
+                                                  for kind in sorted({a[0] for a in reference_anomalies})))
+    for interval in args.intervals:
+        detector = TimedDetector(model)
+        boxes, anomalies, total_time, flow_time = run(frames, detector, interval, oracle)
+        recall, mean_iou = box_agreement(reference, boxes)
+        per_type = anomaly_recall(reference_anomalies, anomalies)
+        flow_frames = max(1, len(frames) - detector.calls)
+        print(f"{interval:8d} {detector.calls:15d} {detector.seconds:11.2f} "
+              f"{reference_seconds / max(detector.seconds, 1e-9):6.1f}x {flow_time / flow_frames * 1000:14.2f} "
+              f"{total_time:8.2f} {recall:11.3f} {mean_iou:9.3f}  "
+              + ", ".join(f"{kind} {value:.2f}" for kind, value in per_type.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# Alert throughput and de-duplication of the notification dispatcher against a
+# local stand-in SMTP server, so nothing leaves the machine.
+#
+#   python benchmarks/bench_notifications.py
+#
+# A burst of alerts is pushed through notify() the way the processing thread
+# does it on every frame. The script reports how long notify() blocks the
+# caller, how many mails reach the server and over how many connections, and
+# then checks that a flaky server is retried with backoff.
+import os
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from notifications import NotificationDispatcher  # noqa: E402
+
+
+class StandInSMTPHandler(socketserver.StreamRequestHandler):
+    # Just enough SMTP for smtplib: greeting, EHLO, MAIL/RCPT, DATA, QUIT
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 stand-in ready")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith(("EHLO", "HELO")):
+                self.reply("250 stand-in")
+            elif command.startswith(("MAIL", "RCPT", "RSET", "NOOP")):
+                self.reply("250 OK")
+            elif command == "DATA":
+                if server.fail_next > 0:
+                    server.fail_next -= 1
+                    self.reply("421 try again later")
+                    return
+                self.reply("354 end with .")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                server.messages += 1
+                self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInSMTPHandler)
+        self.connections = 0
+        self.messages = 0
+        self.fail_next = 0
+
+
+def make_dispatcher(port, rate_limits, **options):
+    settings = {
+        'smtp_server': '127.0.0.1',
+        'smtp_port': port,
+        'sender_email': 'camera@localhost',
+        'sender_password': '',
+        'recipient_email': 'security@localhost',
+        'use_tls': False,
+    }
+    dispatcher = NotificationDispatcher(settings, rate_limits, **options)
+    dispatcher.start()
+    return dispatcher
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def main():
+    server = StandInSMTPServer()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    # 30 seconds of alerts at 30 FPS, two alert types, compressed into a burst
+    alerts = 900
+    dispatcher = make_dispatcher(port, {'anomaly': 0.5, 'detection_threshold': 0.5})
+    enqueue_time = 0.0
+    for index in range(alerts):
+        alert_type = 'anomaly' if index % 3 else 'detection_threshold'
+        start = time.perf_counter()
+        dispatcher.notify(alert_type, f"Security Alert: {alert_type}", f"alert {index}")
+        enqueue_time += time.perf_counter() - start
+        time.sleep(0.001)
+    # Let the last coalesced summaries go out once their rate limit has passed
+    time.sleep(0.1)
+    wait_for(lambda: not dispatcher.pending and dispatcher.incoming.empty())
+    dispatcher.stop()
+    print(f"burst:  {alerts} alerts, notify() {enqueue_time / alerts * 1e6:.1f} us per call, "
+          f"{server.messages} mails over {server.connections} connection(s), "
+          f"{dispatcher.coalesced} coalesced, {dispatcher.dropped} dropped")
+
+    # The first two DATA commands are refused; the mail must still arrive
+    server.messages = server.connections = 0
+    server.fail_next = 2
+    dispatcher = make_dispatcher(port, {}, retry_backoff=0.05)
+    dispatcher.notify('anomaly', "Security Alert: retry", "retried alert")
+    wait_for(lambda: server.messages or dispatcher.failed)
+    dispatcher.stop()
+    print(f"retry:  {server.messages} mail delivered after {dispatcher.retries} retries "
+          f"over {server.connections} connection(s), {dispatcher.failed} failed")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
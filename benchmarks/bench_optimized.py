@@ -0,0 +1,92 @@
+# Accuracy vs latency of the optimized CPU models on a reference clip.
+#
+#   python benchmarks/bench_optimized.py --video reference.mp4 [--frames 200]
+#       [--torch-weights models/yolov5s.pt] [--onnx-weights models/yolov5s.onnx]
+#
+# Every optimized model is compared with its unoptimized counterpart on the
+# same frames: torchscript against eager torch, int8 against fp32 ONNX Runtime.
+# Accuracy is the agreement with the baseline's detections (same class,
+# IoU >= 0.5): precision, recall and mean absolute confidence change. The
+# first run builds the cached models; run it twice to see the cached load time.
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import DEFAULT_WEIGHTS, create_backend  # noqa: E402
+from bench_backends import load_frames  # noqa: E402
+from detections import BOX, CLS, CONF  # noqa: E402
+from model_loader import warm_up  # noqa: E402
+from tracker import assign, iou_matrix  # noqa: E402
+
+PAIRS = [
+    ('torch', 'none', 'torchscript'),
+    ('onnxruntime', 'none', 'int8'),
+]
+
+
+def run(backend_name, weights, optimization, frames, size):
+    start = time.perf_counter()
+    backend = create_backend(backend_name, weights, optimization=optimization)
+    load_time = time.perf_counter() - start
+    warm_up(backend, size)
+    start = time.perf_counter()
+    detections = [backend.detect([frame])[0] for frame in frames]
+    return detections, (time.perf_counter() - start) / len(frames), load_time
+
+
+def agreement(reference, candidate):
+    matched = conf_delta = 0.0
+    for expected, found in zip(reference, candidate):
+        if not len(expected) or not len(found):
+            continue
+        iou = iou_matrix(expected[:, BOX], found[:, BOX])
+        iou[expected[:, None, CLS] != found[None, :, CLS]] = 0.0
+        rows, cols = assign(1.0 - iou)
+        keep = iou[rows, cols] >= 0.5
+        matched += keep.sum()
+        conf_delta += np.abs(expected[rows[keep], CONF] - found[cols[keep], CONF]).sum()
+    total_reference = sum(len(d) for d in reference)
+    total_candidate = sum(len(d) for d in candidate)
+    precision = matched / total_candidate if total_candidate else 1.0
+    recall = matched / total_reference if total_reference else 1.0
+    return precision, recall, conf_delta / matched if matched else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accuracy vs latency of the optimized models.")
+    parser.add_argument("--video", help="Reference clip (random frames otherwise, which only measures latency)")
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--size", default="800x600", help="Frame size as WIDTHxHEIGHT")
+    parser.add_argument("--torch-weights", default=DEFAULT_WEIGHTS['torch'])
+    parser.add_argument("--onnx-weights", default=DEFAULT_WEIGHTS['onnxruntime'])
+    args = parser.parse_args()
+
+    width, height = map(int, args.size.lower().split("x"))
+    frames = load_frames(args.video, args.frames, (width, height))
+    weights = {'torch': args.torch_weights, 'onnxruntime': args.onnx_weights}
+
+    print(f"{len(frames)} frames at {width}x{height}")
+    print(f"{'model':26s} {'load s':>7s} {'ms/frame':>9s} {'speed-up':>9s} {'precision':>10s} {'recall':>7s} {'|dconf|':>8s}")
+    for backend_name, baseline, optimized in PAIRS:
+        try:
+            reference, reference_time, reference_load = run(backend_name, weights[backend_name], baseline,
+                                                            frames, (width, height))
+            candidate, candidate_time, candidate_load = run(backend_name, weights[backend_name], optimized,
+                                                            frames, (width, height))
+        except Exception as e:
+            print(f"{backend_name:26s} skipped: {str(e)}")
+            continue
+        precision, recall, conf_delta = agreement(reference, candidate)
+        print(f"{backend_name + ' ' + baseline:26s} {reference_load:7.2f} {reference_time * 1000:9.1f} "
+              f"{1.0:8.2f}x {'-':>10s} {'-':>7s} {'-':>8s}")
+        print(f"{backend_name + ' ' + optimized:26s} {candidate_load:7.2f} {candidate_time * 1000:9.1f} "
+              f"{reference_time / candidate_time:8.2f}x {precision:10.3f} {recall:7.3f} {conf_delta:8.3f}")
+
+
+if __name__ == "__main__":
+    main()
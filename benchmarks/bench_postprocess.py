@@ -0,0 +1,167 @@
+# Per-frame post-processing time of the old pandas path vs the NumPy detection array.
+#
+#   python benchmarks/bench_postprocess.py
+#
+# Both paths run the same steps on the same synthetic boxes: confidence/class
+# filtering, per-detection DB row preparation, per-object state, restricted
+# area / movement / size checks and the pairwise interaction scan. The database
+# is a no-op stand-in so only the Python-level post-processing is measured.
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from anomalies import UNUSUAL_SIZE, close_pairs  # noqa: E402
+from detections import centers  # noqa: E402
+from engine import DetectionEngine  # noqa: E402
+
+CLASS_NAMES = {0: 'person', 1: 'bicycle', 2: 'car', 24: 'backpack', 28: 'suitcase'}
+FRAME_SHAPE = (720, 1280, 3)
+REPEATS = 200
+
+
+class NullDatabase:
+    def log_detection(self, *args):
+        pass
+
+    def log_anomaly(self, *args):
+        pass
+
+
+class FakeModel:
+    # Only the class names are read during post-processing
+    names = CLASS_NAMES
+
+
+def make_detections(count, rng):
+    xy = rng.uniform(0, [1100, 600], size=(count, 2))
+    wh = rng.uniform(20, 150, size=(count, 2))
+    conf = rng.uniform(0.3, 1.0, size=(count, 1))
+    cls = rng.choice(list(CLASS_NAMES), size=(count, 1))
+    return np.hstack([xy, xy + wh, conf, cls]).astype(np.float32)
+
+
+def to_dataframe(detections):
+    df = pd.DataFrame(detections[:, :5], columns=['xmin', 'ymin', 'xmax', 'ymax', 'confidence'])
+    df['class'] = detections[:, 5].astype(int)
+    df['name'] = df['class'].map(CLASS_NAMES)
+    return df
+
+
+class LegacyPostprocess:
+    # The pandas/iterrows code path as it was before the detection array
+    def __init__(self):
+        self.db_manager = NullDatabase()
+        self.detection_classes = ['person', 'car', 'backpack', 'suitcase']
+        self.confidence_threshold = 0.5
+        self.restricted_area = (300, 150, 900, 550)
+        self.object_tracker = defaultdict(lambda: {"first_detected": None, "last_detected": None,
+                                                   "in_restricted_area": False, "positions": [],
+                                                   "loitering_start": None})
+        self.previous_detections = None
+        self.frame_count = 0
+
+    def run(self, detections, frame_area):
+        self.frame_count += 1
+        filtered = detections[(detections['confidence'] >= self.confidence_threshold) &
+                              (detections['name'].isin(self.detection_classes))]
+        for _, detection in filtered.iterrows():
+            self.db_manager.log_detection((detection['name'], detection['confidence'], detection['xmin'],
+                                           detection['ymin'], detection['xmax'], detection['ymax']))
+        for _, detection in filtered.iterrows():
+            object_id = f"{detection['name']}_{detection['xmin']}_{detection['ymin']}"
+            tracked = self.object_tracker[object_id]
+            if tracked["first_detected"] is None:
+                tracked["first_detected"] = self.frame_count
+            tracked["last_detected"] = self.frame_count
+            tracked["positions"].append((detection['xmin'], detection['ymin'], detection['xmax'], detection['ymax']))
+            x1, y1, x2, y2 = self.restricted_area
+            tracked["in_restricted_area"] = (detection['xmin'] > x1 and detection['ymin'] > y1 and
+                                             detection['xmax'] < x2 and detection['ymax'] < y2)
+            if self.previous_detections is not None:
+                prev = self.previous_detections[self.previous_detections['name'] == detection['name']]
+                if not prev.empty:
+                    prev = prev.iloc[0]
+                    ((prev['xmin'] + prev['xmax']) / 2 - (detection['xmin'] + detection['xmax']) / 2) ** 2
+            area = (detection['xmax'] - detection['xmin']) * (detection['ymax'] - detection['ymin'])
+            if area > frame_area / 4:
+                self.db_manager.log_anomaly(detection['name'])
+        for i, detection1 in filtered.iterrows():
+            for j, detection2 in filtered.iterrows():
+                if i < j:
+                    x1, y1 = (detection1['xmin'] + detection1['xmax']) / 2, (detection1['ymin'] + detection1['ymax']) / 2
+                    x2, y2 = (detection2['xmin'] + detection2['xmax']) / 2, (detection2['ymin'] + detection2['ymax']) / 2
+                    ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5
+        self.previous_detections = filtered
+        for obj_id in list(self.object_tracker.keys()):
+            if self.frame_count - self.object_tracker[obj_id]["last_detected"] > 6:
+                del self.object_tracker[obj_id]
+
+
+class ArrayPostprocess:
+    # The same steps on the detection array, through the engine's own helpers
+    def __init__(self, engine):
+        self.engine = engine
+        self.next_id = 1
+        self.issued = deque()  # Ids per frame, dropped max_age frames later as by the tracker
+
+    def run(self, detections, frame_area):
+        engine = self.engine
+        engine.frame_count += 1
+        filtered = engine.filter_detections(detections)
+        # Random boxes, so every detection is a new object as in the legacy path
+        track_ids = np.arange(self.next_id, self.next_id + len(filtered))
+        self.next_id += len(filtered)
+        self.issued.append(track_ids)
+        removed = self.issued.popleft() if len(self.issued) > engine.tracker.max_age + 1 else ()
+        result = engine.anomaly_rules.evaluate(filtered, track_ids, engine.frame_count, time.time(), frame_area,
+                                               engine.restricted_area, 0, 3, 5, 50, 30, removed)
+        for i in np.flatnonzero(result.flags & UNUSUAL_SIZE):
+            engine.db_manager.log_anomaly(engine.class_name(filtered[i]))
+        close_pairs(centers(filtered), engine.interaction_distance_threshold)
+
+
+def make_engine(folder):
+    engine = DetectionEngine(db_path=os.path.join(folder, 'bench.db'), recordings_folder=os.path.join(folder, 'recordings'))
+    engine.db_manager = NullDatabase()
+    engine.model = FakeModel()
+    engine.detection_classes = ['person', 'car', 'backpack', 'suitcase']
+    engine.restricted_area = (300, 150, 900, 550)
+    engine.notification_settings['notify_on_detection_threshold'] = 10 ** 9
+    return engine
+
+
+def time_per_frame(func, frames):
+    start = time.perf_counter()
+    for frame in frames:
+        func(frame)
+    return (time.perf_counter() - start) / len(frames) * 1000
+
+
+def main():
+    rng = np.random.default_rng(0)
+    frame_area = FRAME_SHAPE[0] * FRAME_SHAPE[1]
+
+    print(f"{'detections':>10} | {'pandas (ms)':>12} | {'numpy (ms)':>11} | {'speed-up':>8}")
+    with tempfile.TemporaryDirectory() as folder:
+        for count in (1, 20, 100):
+            arrays = [make_detections(count, rng) for _ in range(REPEATS)]
+            frames = [to_dataframe(a) for a in arrays]
+
+            legacy = LegacyPostprocess()
+            legacy_ms = time_per_frame(lambda df: legacy.run(df, frame_area), frames)
+
+            current = ArrayPostprocess(make_engine(folder))
+            numpy_ms = time_per_frame(lambda detections: current.run(detections, frame_area), arrays)
+
+            print(f"{count:>10} | {legacy_ms:>12.3f} | {numpy_ms:>11.3f} | {legacy_ms / numpy_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# Throughput vs small-object recall of tiled detection on high-resolution frames.
+#
+#   python benchmarks/bench_tiles.py [--size 3840x2160] [--tile-sizes 640 960] [--workers 0 2]
+#   python benchmarks/bench_tiles.py --video 4k.mp4 [--backend torch] [--weights models/yolov5s.pt]
+#
+# Without --video, frames with people of 20-120 px height are rendered and an
+# oracle detector stands in for YOLO: it finds an object only when it is at
+# least --min-height pixels tall after letterboxing to the model input, and
+# it costs --ms-per-image scaled by the input area. That is the effect that
+# makes distant people vanish when a 4K frame is squeezed into 640 pixels.
+# Recall is against the rendered boxes (IoU >= 0.5), split by object height.
+# With --video the real backend is used and, lacking ground truth, the
+# number of boxes found is reported instead of recall.
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import BACKENDS, create_backend  # noqa: E402
+from detections import BOX, YMAX, YMIN, empty_detections  # noqa: E402
+from tiles import TiledDetector  # noqa: E402
+from tracker import assign, iou_matrix  # noqa: E402
+
+HEIGHT_BANDS = [(0, 40), (40, 80), (80, 10000)]
+
+
+class ResolutionOracle:
+    # Detects the rendered objects that would still be big enough at the model input
+    name = 'oracle'
+    resizable = True
+
+    def __init__(self, min_height=12, ms_per_image=40.0, input_size=640):
+        self.min_height = min_height
+        self.seconds = ms_per_image / 1000
+        self.input_size = input_size
+        self.frame = None
+        self.truth = empty_detections()
+
+    def locate(self, image):
+        # Offset of a crop view inside the current frame
+        offset = image.__array_interface__['data'][0] - self.frame.__array_interface__['data'][0]
+        return (offset % self.frame.strides[0]) // self.frame.strides[1], offset // self.frame.strides[0]
+
+    def detect(self, frames, size=None):
+        size = size or self.input_size
+        results = []
+        for image in frames:
+            x, y = self.locate(image)
+            height, width = image.shape[:2]
+            ratio = min(size / height, size / width)
+            time.sleep(self.seconds * (size / 640) ** 2)
+            boxes = self.truth.copy()
+            boxes[:, [0, 2]] = (boxes[:, [0, 2]] - x).clip(0, width)
+            boxes[:, [1, 3]] = (boxes[:, [1, 3]] - y).clip(0, height)
+            visible = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+            full = (self.truth[:, 2] - self.truth[:, 0]) * (self.truth[:, 3] - self.truth[:, 1])
+            keep = (visible >= 0.3 * full) & ((boxes[:, 3] - boxes[:, 1]) * ratio >= self.min_height)
+            results.append(boxes[keep])
+        return results
+
+
+def render_frames(count, size, objects=40, seed=0):
+    rng = np.random.default_rng(seed)
+    width, height = size
+    frames, truth = [], []
+    for _ in range(count):
+        frame = cv2.GaussianBlur(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), (0, 0), 5)
+        rows = []
+        for _ in range(objects):
+            h = int(rng.uniform(20, 120))
+            w = max(8, h // 2)
+            x, y = int(rng.uniform(0, width - w)), int(rng.uniform(0, height - h))
+            frame[y:y + h, x:x + w] = rng.integers(0, 255, 3)
+            rows.append([x, y, x + w, y + h, 0.9, 0])
+        frames.append(frame)
+        truth.append(np.array(rows, dtype=np.float32))
+    return frames, truth
+
+
+def recall_by_height(truth, found):
+    hits = np.zeros(len(HEIGHT_BANDS))
+    totals = np.zeros(len(HEIGHT_BANDS))
+    for expected, detections in zip(truth, found):
+        heights = expected[:, YMAX] - expected[:, YMIN]
+        bands = np.array([next(i for i, (low, high) in enumerate(HEIGHT_BANDS) if low <= h < high) for h in heights])
+        np.add.at(totals, bands, 1)
+        if not len(detections):
+            continue
+        iou = iou_matrix(expected[:, BOX].astype(np.float64), detections[:, BOX].astype(np.float64))
+        rows, cols = assign(1.0 - iou)
+        rows = rows[iou[rows, cols] >= 0.5]
+        np.add.at(hits, bands[rows], 1)
+    return hits / np.maximum(totals, 1)
+
+
+def run(model, frames, truth, tiler):
+    found = []
+    start = time.perf_counter()
+    for index, frame in enumerate(frames):
+        if isinstance(model, ResolutionOracle):
+            model.frame, model.truth = frame, truth[index]
+        if tiler is None:
+            found.append(model.detect([frame])[0])
+        else:
+            found.append(tiler.detect(model, frame))
+    return found, len(frames) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiled vs full-frame detection on high-resolution frames.")
+    parser.add_argument("--video", help="High-resolution clip (rendered frames with an oracle detector otherwise)")
+    parser.add_argument("--frames", type=int, default=10)
+    parser.add_argument("--size", default="3840x2160", help="Rendered frame size as WIDTHxHEIGHT")
+    parser.add_argument("--tile-sizes", type=int, nargs="+", default=[640, 960])
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--backend", choices=BACKENDS, default='torch')
+    parser.add_argument("--weights")
+    parser.add_argument("--min-height", type=float, default=12, help="Oracle: smallest detectable height at the model input")
+    parser.add_argument("--ms-per-image", type=float, default=40.0, help="Oracle: time per 640x640 input")
+    args = parser.parse_args()
+
+    if args.video:
+        frames = []
+        cap = cv2.VideoCapture(args.video)
+        while len(frames) < args.frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        cap.release()
+        truth = None
+        model = create_backend(args.backend, args.weights)
+    else:
+        width, height = map(int, args.size.lower().split("x"))
+        frames, truth = render_frames(args.frames, (width, height))
+        model = ResolutionOracle(args.min_height, args.ms_per_image)
+    if not frames:
+        print(f"No frames read from {args.video}")
+        return
+
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames at {width}x{height}")
+    bands = "".join(f"{f'recall {low}-{high}px' if high < 10000 else f'recall {low}px+':>17s}"
+                    for low, high in HEIGHT_BANDS)
+    print(f"{'mode':28s} {'FPS':>6s} {'boxes/frame':>12s}{bands if truth is not None else ''}")
+    configurations = [('full frame', None)]
+    for tile_size in args.tile_sizes:
+        for workers in args.workers:
+            label = f"tiles {tile_size}" + (f", {workers} workers" if workers > 1 else "")
+            configurations.append((label, TiledDetector(tile_size, args.overlap, workers=workers, min_scale=0)))
+    for label, tiler in configurations:
+        found, fps = run(model, frames, truth, tiler)
+        line = f"{label:28s} {fps:6.2f} {np.mean([len(d) for d in found]):12.1f}"
+        if truth is not None:
+            line += "".join(f"{value:17.3f}" for value in recall_by_height(truth, found))
+        print(line)
+        if tiler is not None:
+            tiler.close()
+
+
+if __name__ == "__main__":
+    main()
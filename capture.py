@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+DROP_LATEST = "latest"  # Live sources: hand out the newest frame and drop stale ones
+DROP_NONE = "block"  # Files: lossless, the decoder waits for the consumer
+
+
+class FrameReader(threading.Thread):
+    # Decodes ahead of the pipeline on its own thread into a fixed ring of
+    # preallocated frame buffers. One extra slot is reserved for the frame the
+    # consumer is currently working on, so it is never overwritten underneath it.
+    def __init__(self, cap, capacity=4, drop_policy=DROP_NONE):
+        super().__init__(daemon=True)
+        if drop_policy not in (DROP_LATEST, DROP_NONE):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.cap = cap
+        self.capacity = max(1, int(capacity))
+        self.drop_policy = drop_policy
+        self.buffers = [None] * (self.capacity + 1)
+        self.free_slots = deque(range(self.capacity + 1))
+        self.ready_slots = deque()
+        self.held_slot = None
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.finished = False
+        self.frames_decoded = 0
+        self.frames_dropped = 0
+        self.decode_time = 0.0
+
+    def allocate_buffers(self, frame):
+        # Preallocate the idle slots once the real frame geometry is known
+        with self.condition:
+            for i in self.free_slots:
+                if self.buffers[i] is None or self.buffers[i].shape != frame.shape:
+                    self.buffers[i] = np.empty_like(frame)
+
+    def acquire_write_slot(self):
+        with self.condition:
+            while not self.free_slots:
+                if self.stop_event.is_set():
+                    return None
+                if self.drop_policy == DROP_LATEST and self.ready_slots:
+                    # Overwrite the oldest undelivered frame
+                    self.free_slots.append(self.ready_slots.popleft())
+                    self.frames_dropped += 1
+                else:
+                    self.condition.wait(0.1)
+            return self.free_slots.popleft()
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                slot = self.acquire_write_slot()
+                if slot is None:
+                    break
+
+                start = time.perf_counter()
+                ret, frame = self.cap.read(self.buffers[slot])
+                self.decode_time = time.perf_counter() - start
+
+                if not ret:
+                    with self.condition:
+                        self.free_slots.append(slot)
+                    break
+
+                if frame is not self.buffers[slot]:
+                    # First frame or geometry change: OpenCV allocated a new array
+                    self.allocate_buffers(frame)
+                    self.buffers[slot] = frame
+
+                with self.condition:
+                    self.ready_slots.append(slot)
+                    self.frames_decoded += 1
+                    self.condition.notify_all()
+        except Exception as e:
+            print(f"Frame reader stopped: {str(e)}")
+        finally:
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+            self.cap.release()
+
+    def read(self, timeout=None):
+        # Returns (ret, frame) like cv2.VideoCapture.read(). The frame stays
+        # valid until the next call to read().
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            if self.held_slot is not None:
+                self.free_slots.append(self.held_slot)
+                self.held_slot = None
+                self.condition.notify_all()
+
+            while not self.ready_slots:
+                if self.finished or self.stop_event.is_set():
+                    return False, None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False, None
+                self.condition.wait(remaining)
+
+            if self.drop_policy == DROP_LATEST:
+                while len(self.ready_slots) > 1:
+                    self.free_slots.append(self.ready_slots.popleft())
+                    self.frames_dropped += 1
+
+            self.held_slot = self.ready_slots.popleft()
+            self.condition.notify_all()
+            return True, self.buffers[self.held_slot]
+
+    def get(self, prop_id):
+        return self.cap.get(prop_id)
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        if self.ident is None:
+            # Never started, so run() will not release the capture
+            self.cap.release()
+        elif self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+
+def open_capture(source, is_live):
+    cap = cv2.VideoCapture(source)
+    if is_live:
+        # Keep the driver queue short; the reader does its own buffering
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
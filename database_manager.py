@@ -0,0 +1,551 @@
+import sqlite3
+import csv
+import queue
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+DETECTION_INSERT = '''
+    INSERT INTO detections (timestamp, ts_ms, camera_id, object_type, confidence, x_min, y_min, x_max, y_max, frame_number)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+ANOMALY_INSERT = '''
+    INSERT INTO anomalies (timestamp, ts_ms, camera_id, anomaly_type, description, x_min, y_min, x_max, y_max, frame_number, severity, event_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# An anomaly event is one row, written when it starts and completed here when it ends
+ANOMALY_CLOSE = '''
+    UPDATE anomalies
+    SET end_ts_ms = ?, duration_ms = ?, end_frame = ?, severity = MAX(COALESCE(severity, 0), ?),
+        description = COALESCE(?, description)
+    WHERE event_id = ?
+'''
+
+# Columns added to the anomalies table after its first release
+ANOMALY_COLUMNS = {
+    'frame_number': 'INTEGER',
+    'severity': 'INTEGER',
+    'event_id': 'TEXT',
+    'end_ts_ms': 'INTEGER',
+    'duration_ms': 'INTEGER',
+    'end_frame': 'INTEGER',
+}
+
+# PRAGMA user_version of the database file:
+#   1 - ts_ms (epoch milliseconds) and camera_id columns plus their indexes
+#   2 - ts_ms filled in for every row written before version 1
+#   3 - rollup tables hold the counts of every row written before they existed
+SCHEMA_VERSION = 3
+
+TIMESTAMP_INDEXES = {
+    'idx_detections_ts': 'detections (ts_ms)',
+    'idx_detections_type_ts': 'detections (object_type, ts_ms)',
+    'idx_anomalies_ts': 'anomalies (ts_ms)',
+    'idx_anomalies_type_ts': 'anomalies (anomaly_type, ts_ms)',
+}
+
+
+# Per-minute and per-hour counts per camera and class/anomaly type, kept up
+# to date by every insert so dashboard stats never scan the raw tables.
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+ROLLUP_PERIODS = (MINUTE_MS, HOUR_MS)
+
+# Raw table -> (rollup table, type column)
+ROLLUPS = {
+    'detections': ('detection_rollups', 'object_type'),
+    'anomalies': ('anomaly_rollups', 'anomaly_type'),
+}
+STATEMENT_TABLES = {DETECTION_INSERT: 'detections', ANOMALY_INSERT: 'anomalies'}
+
+
+def rollup_upsert(table):
+    rollup_table, type_column = ROLLUPS[table]
+    return f'''
+        INSERT INTO {rollup_table} (period_ms, bucket_ms, camera_id, {type_column}, count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (period_ms, bucket_ms, camera_id, {type_column})
+        DO UPDATE SET count = count + excluded.count
+    '''
+
+
+def rollup_counts(entries):
+    # entries: (ts_ms, camera_id, type) per raw row -> one upsert row per bucket
+    counts = Counter()
+    for ts_ms, camera_id, row_type in entries:
+        for period in ROLLUP_PERIODS:
+            counts[(period, ts_ms - ts_ms % period, camera_id or '', row_type)] += 1
+    return [key + (count,) for key, count in counts.items()]
+
+
+def write_rows(conn, statement, rows):
+    # Raw rows and their rollup increments go into the caller's transaction
+    # together; updates of rows already written count nothing
+    conn.executemany(statement, rows)
+    table = STATEMENT_TABLES.get(statement)
+    if table is None:
+        return
+    conn.executemany(rollup_upsert(table), rollup_counts((row[1], row[2], row[3]) for row in rows))
+
+
+def to_ms(moment):
+    return int(moment.timestamp() * 1000)
+
+
+def parse_timestamp_ms(text):
+    # Old rows hold datetime.now().isoformat() local times; unreadable ones get 0
+    try:
+        return to_ms(datetime.fromisoformat(text))
+    except (TypeError, ValueError):
+        return 0
+
+
+class DatabaseWriter(threading.Thread):
+    # Drains queued rows on one long-lived WAL connection and inserts them with
+    # executemany, one transaction per flush interval.
+    #
+    # Slow-disk policy: the queue holds at most max_pending rows. When it is
+    # full, detection rows are dropped (counted in dropped_detections) because
+    # the next frames carry the same information. Anomaly rows spill into a
+    # separate in-memory overflow of up to max_spill rows that is written
+    # first on the next flush; only when that is full too are anomalies dropped
+    # (counted in dropped_anomalies).
+    def __init__(self, db_path, flush_interval=0.5, max_pending=20000, max_spill=5000):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.spill = deque(maxlen=max_spill)
+        self.spill_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.rows_written = 0
+        self.flushes = 0
+        self.dropped_detections = 0
+        self.dropped_anomalies = 0
+        self.last_flush_time = 0.0
+
+    def put(self, statement, row):
+        try:
+            self.pending.put_nowait((statement, row))
+        except queue.Full:
+            if statement is DETECTION_INSERT:
+                self.dropped_detections += 1
+                return
+            with self.spill_lock:
+                if len(self.spill) == self.spill.maxlen:
+                    self.dropped_anomalies += 1
+                else:
+                    self.spill.append((statement, row))
+
+    def drain(self):
+        with self.spill_lock:
+            batch = list(self.spill)
+            self.spill.clear()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                batch.append(self.pending.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                return batch
+            # Pick up everything that is already waiting without sleeping again
+            if time.monotonic() >= deadline:
+                while True:
+                    try:
+                        batch.append(self.pending.get_nowait())
+                    except queue.Empty:
+                        return batch
+
+    def flush(self, conn, batch):
+        if not batch:
+            return
+        start = time.perf_counter()
+        grouped = {}
+        for statement, row in batch:
+            grouped.setdefault(statement, []).append(row)
+        with conn:
+            # Inserts before updates: an event can start and end within one batch
+            for statement in sorted(grouped, key=lambda statement: statement not in STATEMENT_TABLES):
+                write_rows(conn, statement, grouped[statement])
+        self.rows_written += len(batch)
+        self.flushes += 1
+        self.last_flush_time = time.perf_counter() - start
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.flush(conn, self.drain())
+                except sqlite3.Error as e:
+                    print(f"Database writer failed to flush: {str(e)}")
+            # Write whatever was queued before stop()
+            remaining = []
+            while True:
+                try:
+                    remaining.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            with self.spill_lock:
+                remaining = list(self.spill) + remaining
+                self.spill.clear()
+            self.flush(conn, remaining)
+        finally:
+            conn.close()
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+class SchemaBackfill(threading.Thread):
+    # Fills ts_ms for rows written before the schema migration, newest first,
+    # then counts those rows into the rollup tables, in small batches that
+    # each commit on their own. The app keeps reading and writing in between,
+    # and an interrupted backfill resumes on the next start: ts_ms is only
+    # filled where it is still NULL, and rollup_backfill remembers the highest
+    # id that has not been counted yet.
+    def __init__(self, db_path, batch_size=5000, pause=0.05):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.pause = pause
+        self.stop_event = threading.Event()
+        self.rows_converted = 0
+        self.rows_rolled_up = 0
+
+    def convert_batch(self, conn, table):
+        rows = conn.execute(f'''
+            SELECT id, timestamp FROM {table}
+            WHERE ts_ms IS NULL
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (self.batch_size,)).fetchall()
+        if rows:
+            with conn:
+                conn.executemany(f'UPDATE {table} SET ts_ms = ? WHERE id = ?',
+                                 [(parse_timestamp_ms(timestamp), row_id) for row_id, timestamp in rows])
+            self.rows_converted += len(rows)
+        return len(rows)
+
+    def rollup_batch(self, conn, table):
+        last_id = conn.execute('SELECT last_id FROM rollup_backfill WHERE table_name = ?', (table,)).fetchone()[0]
+        if last_id <= 0:
+            return 0
+        first_id = max(0, last_id - self.batch_size)
+        _, type_column = ROLLUPS[table]
+        entries = conn.execute(f'''
+            SELECT ts_ms, camera_id, {type_column} FROM {table}
+            WHERE id > ? AND id <= ?
+        ''', (first_id, last_id)).fetchall()
+        with conn:
+            conn.executemany(rollup_upsert(table), rollup_counts(entries))
+            conn.execute('UPDATE rollup_backfill SET last_id = ? WHERE table_name = ?', (first_id, table))
+        self.rows_rolled_up += len(entries)
+        return last_id - first_id
+
+    def run(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            for step in (self.convert_batch, self.rollup_batch):
+                for table in ('detections', 'anomalies'):
+                    while not self.stop_event.is_set() and step(conn, table):
+                        time.sleep(self.pause)
+            if not self.stop_event.is_set():
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+                print(f"Database migration finished: {self.rows_converted} rows converted, "
+                      f"{self.rows_rolled_up} rows added to the rollups")
+        except sqlite3.Error as e:
+            print(f"Database migration stopped: {str(e)}")
+        finally:
+            conn.close()
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+class DatabaseManager:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.writer = None
+        self.backfill = None
+
+    def get_connection(self):
+        return sqlite3.connect(self.db_path)
+
+    def start_writer(self, flush_interval=0.5):
+        # Route log_detection/log_anomaly through a background batch writer
+        if self.writer is None:
+            self.writer = DatabaseWriter(self.db_path, flush_interval)
+            self.writer.start()
+        return self.writer
+
+    def stop_writer(self):
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+
+    def close(self):
+        if self.backfill is not None:
+            self.backfill.stop()
+            self.backfill = None
+        self.stop_writer()
+
+    def setup_database(self, background_migration=True):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Modify detections table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS detections (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT,
+                    ts_ms INTEGER,
+                    camera_id TEXT,
+                    object_type TEXT,
+                    confidence REAL,
+                    x_min INTEGER,
+                    y_min INTEGER,
+                    x_max INTEGER,
+                    y_max INTEGER,
+                    frame_number INTEGER
+                )
+            ''')
+            
+            # Modify anomalies table
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS anomalies (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT,
+                    ts_ms INTEGER,
+                    camera_id TEXT,
+                    anomaly_type TEXT,
+                    description TEXT,
+                    x_min INTEGER,
+                    y_min INTEGER,
+                    x_max INTEGER,
+                    y_max INTEGER,
+                    frame_number INTEGER,
+                    severity INTEGER,
+                    event_id TEXT,
+                    end_ts_ms INTEGER,
+                    duration_ms INTEGER,
+                    end_frame INTEGER
+                )
+            ''')
+            
+            # Add missing columns to detections table if they don't exist
+            cursor.execute('PRAGMA table_info(detections)')
+            columns = {column[1] for column in cursor.fetchall()}
+            missing_columns = {'frame_number'} - columns
+            for column in missing_columns:
+                cursor.execute(f'ALTER TABLE detections ADD COLUMN {column} INTEGER')
+
+            # Add missing columns to anomalies table if they don't exist
+            cursor.execute('PRAGMA table_info(anomalies)')
+            columns = {column[1] for column in cursor.fetchall()}
+            for column, column_type in ANOMALY_COLUMNS.items():
+                if column not in columns:
+                    cursor.execute(f'ALTER TABLE anomalies ADD COLUMN {column} {column_type}')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_anomalies_event ON anomalies (event_id)')
+
+            conn.commit()
+
+        # WAL lets the dashboard read while the writer thread inserts
+        with self.get_connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+
+        self.migrate_schema(background_migration)
+
+    def migrate_schema(self, background=True):
+        with self.get_connection() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version < 1:
+                # Adding nullable columns only touches the table definition,
+                # so this step is quick even on large databases
+                for table in ('detections', 'anomalies'):
+                    columns = {column[1] for column in conn.execute(f'PRAGMA table_info({table})')}
+                    if 'ts_ms' not in columns:
+                        conn.execute(f'ALTER TABLE {table} ADD COLUMN ts_ms INTEGER')
+                    if 'camera_id' not in columns:
+                        conn.execute(f'ALTER TABLE {table} ADD COLUMN camera_id TEXT')
+                for name, target in TIMESTAMP_INDEXES.items():
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {target}')
+                conn.execute('PRAGMA user_version = 1')
+                conn.commit()
+                version = 1
+
+            for table, (rollup_table, type_column) in ROLLUPS.items():
+                conn.execute(f'''
+                    CREATE TABLE IF NOT EXISTS {rollup_table} (
+                        period_ms INTEGER NOT NULL,
+                        bucket_ms INTEGER NOT NULL,
+                        camera_id TEXT NOT NULL DEFAULT '',
+                        {type_column} TEXT NOT NULL,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (period_ms, bucket_ms, camera_id, {type_column})
+                    )
+                ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS rollup_backfill (
+                    table_name TEXT PRIMARY KEY,
+                    last_id INTEGER NOT NULL
+                )
+            ''')
+            # Rows up to the current highest id were written before the rollups
+            # existed and are counted by the backfill; later rows count themselves
+            for table in ROLLUPS:
+                conn.execute(f'''
+                    INSERT OR IGNORE INTO rollup_backfill (table_name, last_id)
+                    SELECT ?, COALESCE(MAX(id), 0) FROM {table}
+                ''', (table,))
+            conn.commit()
+
+        if version < SCHEMA_VERSION:
+            # Converting old timestamps and counting old rows is the slow part, so it runs in batches
+            backfill = SchemaBackfill(self.db_path)
+            if background:
+                self.backfill = backfill
+                backfill.start()
+            else:
+                backfill.run()
+
+    def write_row(self, statement, row):
+        if self.writer is not None:
+            self.writer.put(statement, row)
+            return
+        with self.get_connection() as conn:
+            write_rows(conn, statement, [row])
+            conn.commit()
+
+    def log_detection(self, object_type, confidence, box, frame_number, camera_id=None):
+        now = datetime.now()
+        self.write_row(DETECTION_INSERT, (
+            now.isoformat(),
+            to_ms(now),
+            camera_id,
+            object_type,
+            confidence,
+            *box,
+            frame_number
+        ))
+
+    def log_anomaly(self, anomaly_type, description, box, frame_number, severity, camera_id=None, event_id=None):
+        # With an event_id the row stays open until close_anomaly
+        now = datetime.now()
+        self.write_row(ANOMALY_INSERT, (
+            now.isoformat(),
+            to_ms(now),
+            camera_id,
+            anomaly_type,
+            description,
+            *box,
+            frame_number,
+            severity,
+            event_id
+        ))
+
+    def close_anomaly(self, event_id, end_time, duration, end_frame, peak_severity, description=None):
+        # end_time is the time.time() of the last frame the anomaly was seen on, duration in seconds
+        self.write_row(ANOMALY_CLOSE, (
+            int(end_time * 1000),
+            int(duration * 1000),
+            end_frame,
+            peak_severity,
+            description,
+            event_id
+        ))
+
+    def get_recent_detections(self, limit=5):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT timestamp, object_type, confidence
+                FROM detections
+                ORDER BY ts_ms DESC
+                LIMIT ?
+            ''', (limit,))
+            return cursor.fetchall()
+
+    def get_recent_anomalies(self, limit=5):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT timestamp, anomaly_type, description
+                FROM anomalies
+                ORDER BY ts_ms DESC
+                LIMIT ?
+            ''', (limit,))
+            return cursor.fetchall()
+
+    def get_rollup_stats(self, table, time_range=None, camera_id=None):
+        # Sums whole hours plus the minutes before the first whole hour, so the
+        # cost follows the number of buckets in the range, not the raw rows
+        rollup_table, type_column = ROLLUPS[table]
+        camera_filter = '' if camera_id is None else 'AND camera_id = ?'
+        camera_args = () if camera_id is None else (camera_id,)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+
+            if time_range:
+                start_time = to_ms(datetime.now() - time_range)
+                minute_start = start_time - start_time % MINUTE_MS
+                hour_start = -(-minute_start // HOUR_MS) * HOUR_MS
+                query = f'''
+                    SELECT {type_column}, SUM(count) as count
+                    FROM (
+                        SELECT {type_column}, count FROM {rollup_table}
+                        WHERE period_ms = ? AND bucket_ms >= ? AND bucket_ms < ? {camera_filter}
+                        UNION ALL
+                        SELECT {type_column}, count FROM {rollup_table}
+                        WHERE period_ms = ? AND bucket_ms >= ? {camera_filter}
+                    )
+                    GROUP BY {type_column}
+                '''
+                cursor.execute(query, (MINUTE_MS, minute_start, hour_start, *camera_args,
+                                       HOUR_MS, hour_start, *camera_args))
+            else:
+                query = f'''
+                    SELECT {type_column}, SUM(count) as count
+                    FROM {rollup_table}
+                    WHERE period_ms = ? {camera_filter}
+                    GROUP BY {type_column}
+                '''
+                cursor.execute(query, (HOUR_MS, *camera_args))
+
+            return cursor.fetchall()
+
+    def get_detection_stats(self, time_range=None, camera_id=None):
+        return self.get_rollup_stats('detections', time_range, camera_id)
+
+    def get_anomaly_stats(self, time_range=None, camera_id=None):
+        return self.get_rollup_stats('anomalies', time_range, camera_id)
+
+    def cleanup_old_records(self, days_to_keep):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cutoff = to_ms(datetime.now() - timedelta(days=days_to_keep))
+
+            cursor.execute('DELETE FROM detections WHERE ts_ms < ?', (cutoff,))
+            cursor.execute('DELETE FROM anomalies WHERE ts_ms < ?', (cutoff,))
+            for rollup_table, _ in ROLLUPS.values():
+                cursor.execute(f'DELETE FROM {rollup_table} WHERE bucket_ms < ?', (cutoff - cutoff % HOUR_MS,))
+            
+            conn.commit()
+
+    def export_to_csv(self, table_name, output_file):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM {table_name}")
+            
+            with open(output_file, 'w', newline='') as csvfile:
+                csv_writer = csv.writer(csvfile)
+                csv_writer.writerow([description[0] for description in cursor.description])  # Write headers
+                csv_writer.writerows(cursor)
@@ -2,6 +2,8 @@
 CREATE TABLE detections (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT,
+    ts_ms INTEGER,
+    camera_id TEXT,
     object_type TEXT,
     confidence REAL,
     x_min INTEGER,
@@ -12,9 +14,13 @@ CREATE TABLE detections (
 );
 
 -- Anomalies tablosu
+-- Her anomali olay tek satrdr: olay balaynca yazlr, bitince end_ts_ms,
+-- duration_ms, end_frame ve en yksek severity ile gncellenir (event_id ile)
 CREATE TABLE anomalies (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT,
+    ts_ms INTEGER,
+    camera_id TEXT,
     anomaly_type TEXT,
     description TEXT,
     x_min INTEGER,
@@ -22,12 +28,59 @@ CREATE TABLE anomalies (
     x_max INTEGER,
     y_max INTEGER,
     frame_number INTEGER,
-    severity INTEGER
+    severity INTEGER,
+    event_id TEXT,
+    end_ts_ms INTEGER,
+    duration_ms INTEGER,
+    end_frame INTEGER
 );
 
+-- ndeksler (ts_ms: epoch milisaniye)
+CREATE INDEX idx_detections_ts ON detections (ts_ms);
+CREATE INDEX idx_detections_type_ts ON detections (object_type, ts_ms);
+CREATE INDEX idx_anomalies_ts ON anomalies (ts_ms);
+CREATE INDEX idx_anomalies_type_ts ON anomalies (anomaly_type, ts_ms);
+CREATE INDEX idx_anomalies_event ON anomalies (event_id);
+
+-- Dakikalk (period_ms = 60000) ve saatlik (period_ms = 3600000) saymlar
+CREATE TABLE detection_rollups (
+    period_ms INTEGER NOT NULL,
+    bucket_ms INTEGER NOT NULL,
+    camera_id TEXT NOT NULL DEFAULT '',
+    object_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (period_ms, bucket_ms, camera_id, object_type)
+);
+
+CREATE TABLE anomaly_rollups (
+    period_ms INTEGER NOT NULL,
+    bucket_ms INTEGER NOT NULL,
+    camera_id TEXT NOT NULL DEFAULT '',
+    anomaly_type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (period_ms, bucket_ms, camera_id, anomaly_type)
+);
+
+CREATE TABLE rollup_backfill (
+    table_name TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL
+);
+
+INSERT INTO rollup_backfill (table_name, last_id) VALUES ('detections', 0), ('anomalies', 0);
+
+PRAGMA user_version = 3;
+
 -- rnek veri ekleme
-INSERT INTO detections (timestamp, object_type, confidence, x_min, y_min, x_max, y_max, frame_number)
-VALUES ('2024-09-06 14:30:00', 'person', 0.95, 100, 150, 300, 400, 1234);
+INSERT INTO detections (timestamp, ts_ms, camera_id, object_type, confidence, x_min, y_min, x_max, y_max, frame_number)
+VALUES ('2024-09-06 14:30:00', 1725622200000, 'cam0', 'person', 0.95, 100, 150, 300, 400, 1234);
+
+INSERT INTO anomalies (timestamp, ts_ms, camera_id, anomaly_type, description, x_min, y_min, x_max, y_max, frame_number, severity,
+                       event_id, end_ts_ms, duration_ms, end_frame)
+VALUES ('2024-09-06 14:30:05', 1725622205000, 'cam0', 'Rapid Movement', 'Hzl hareket tespit edildi', 200, 250, 350, 450, 1240, 2,
+        '3f2a9c1e5b7d4e0f8a6b2c4d1e3f5a7b', 1725622205400, 400, 1252);
+
+INSERT INTO detection_rollups (period_ms, bucket_ms, camera_id, object_type, count)
+VALUES (60000, 1725622200000, 'cam0', 'person', 1), (3600000, 1725620400000, 'cam0', 'person', 1);
 
-INSERT INTO anomalies (timestamp, anomaly_type, description, x_min, y_min, x_max, y_max, frame_number, severity)
-VALUES ('2024-09-06 14:30:05', 'Rapid Movement', 'Hzl hareket tespit edildi', 200, 250, 350, 450, 1240, 2);
\ No newline at end of file
+INSERT INTO anomaly_rollups (period_ms, bucket_ms, camera_id, anomaly_type, count)
+VALUES (60000, 1725622200000, 'cam0', 'Rapid Movement', 1), (3600000, 1725620400000, 'cam0', 'Rapid Movement', 1);
\ No newline at end of file
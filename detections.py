@@ -0,0 +1,98 @@
+import numpy as np
+
+# Per-frame detections are an N x 6 float32 array, one row per box:
+# [xmin, ymin, xmax, ymax, confidence, class_id]
+XMIN, YMIN, XMAX, YMAX, CONF, CLS = range(6)
+BOX = slice(XMIN, YMAX + 1)
+
+# Filter names covering several COCO classes
+CLASS_GROUPS = {
+    'vehicle': ['car', 'truck', 'bus', 'motorcycle'],
+    'animal': ['bird', 'cat', 'dog', 'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe'],
+}
+
+
+def empty_detections():
+    return np.zeros((0, 6), dtype=np.float32)
+
+
+def from_results(results, index=0):
+    # YOLOv5 AutoShape results already hold the (n, 6) tensor per image;
+    # taking it directly skips building a pandas DataFrame every frame.
+    tensor = results.xyxy[index]
+    if hasattr(tensor, 'cpu'):
+        tensor = tensor.cpu().numpy()
+    return np.ascontiguousarray(tensor, dtype=np.float32).reshape(-1, 6)
+
+
+def class_names_of(model):
+    names = getattr(model, 'names', None) or {}
+    if isinstance(names, dict):
+        return {int(k): v for k, v in names.items()}
+    return dict(enumerate(names))
+
+
+def expand_class_names(names, class_names):
+    # Filter names are model class names or CLASS_GROUPS keys; 'other' is
+    # every model class that is neither 'person' nor in a group
+    grouped = {'person'}.union(*CLASS_GROUPS.values())
+    expanded = set()
+    for name in names:
+        if name == 'other':
+            expanded.update(n for n in class_names.values() if n not in grouped)
+        else:
+            expanded.update(CLASS_GROUPS.get(name, [name]))
+    return expanded
+
+
+def class_ids_for(names, class_names):
+    expanded = expand_class_names(names, class_names)
+    return np.array(sorted(class_id for class_id, name in class_names.items() if name in expanded), dtype=np.float32)
+
+
+def confidence_table(class_ids, default, per_class, class_names):
+    # Minimum confidence per class id, indexed by the CLS column. Classes that
+    # are not selected get inf; the last entry catches ids the model does not name.
+    table = np.full(max(class_names, default=-1) + 2, np.inf, dtype=np.float32)
+    table[class_ids.astype(int)] = default
+    for name, threshold in (per_class or {}).items():
+        ids = [class_id for class_id, n in class_names.items() if n in expand_class_names([name], class_names)]
+        selected = [class_id for class_id in ids if np.isfinite(table[class_id])]
+        table[selected] = threshold
+    return table
+
+
+def passes_confidence(detections, table):
+    classes = np.minimum(detections[:, CLS].astype(int), len(table) - 1)
+    return detections[:, CONF] >= table[classes]
+
+
+def box_of(detection):
+    return int(detection[XMIN]), int(detection[YMIN]), int(detection[XMAX]), int(detection[YMAX])
+
+
+def centers(detections):
+    return np.stack(((detections[:, XMIN] + detections[:, XMAX]) / 2,
+                     (detections[:, YMIN] + detections[:, YMAX]) / 2), axis=1)
+
+
+def areas(detections):
+    return (detections[:, XMAX] - detections[:, XMIN]) * (detections[:, YMAX] - detections[:, YMIN])
+
+
+def overlaps_any(detections, others, iou_threshold=0.5, ios_threshold=0.6):
+    # True for each detection that overlaps a box of the same class in `others`,
+    # by IoU or by intersection over the smaller box (a copy cut off at an edge)
+    if not len(detections) or not len(others):
+        return np.zeros(len(detections), dtype=bool)
+    a = detections[:, None, BOX].astype(np.float64)
+    b = others[None, :, BOX].astype(np.float64)
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    iou = intersection / np.maximum(area_a + area_b - intersection, 1e-9)
+    ios = intersection / np.maximum(np.minimum(area_a, area_b), 1e-9)
+    same_class = detections[:, None, CLS] == others[None, :, CLS]
+    return (same_class & ((iou > iou_threshold) | (ios > ios_threshold))).any(axis=1)
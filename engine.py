@@ -0,0 +1,979 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+import time
+import threading
+import queue
+from datetime import datetime
+import os
+import json
+
+from anomalies import (SUDDEN_APPEARANCE, RESTRICTED_AREA, RAPID_MOVEMENT, UNUSUAL_SIZE, LOITERING,
+                       AnomalyRules, EventTable, close_pairs, pair_keys)
+from capture import FrameReader, DROP_LATEST, DROP_NONE
+from database_manager import DatabaseManager
+from backends import DEFAULT_BACKEND
+from model_loader import WARMUP_SIZE, ModelLoader, report_cold_start
+from frame_skip import FrameSkipController
+from keyframes import KeyframePropagator
+from motion import MotionGate
+from tiles import TiledDetector
+from detections import (XMIN, YMIN, XMAX, YMAX, CONF, CLS, BOX, box_of, centers, class_ids_for,
+                        class_names_of, confidence_table, empty_detections, overlaps_any,
+                        passes_confidence)
+from notifications import NotificationDispatcher
+from tracker import MultiObjectTracker
+
+SETTING_KEYS = [
+    'confidence_threshold', 'class_confidence', 'loitering_threshold', 'detection_classes',
+    'anomaly_threshold_time', 'rapid_movement_threshold',
+    'sudden_appearance_threshold', 'interaction_distance_threshold',
+    'anomaly_min_frames', 'anomaly_end_frames',
+    'anomaly_detection_enabled', 'automatic_recording_enabled',
+    'motion_gate_enabled', 'motion_method', 'motion_threshold',
+    'adaptive_skip_enabled', 'target_fps', 'keyframe_interval',
+    'roi_inference_enabled', 'roi_margin', 'roi_full_frame_interval',
+    'tiled_inference_enabled', 'tile_size', 'tile_overlap', 'tile_workers',
+]
+
+# Objects that make a person-object interaction suspicious
+SUSPICIOUS_OBJECTS = ('backpack', 'handbag', 'suitcase')
+
+# Anomaly rule -> (database type, severity, overlay label, log message,
+# database description). {value} is filled with the rule's measured value:
+# the value at the start of the event in the message, its peak in the
+# description the row gets when the event ends.
+ANOMALY_EVENTS = {
+    SUDDEN_APPEARANCE: ("Sudden appearance", 1, "SUDDEN APPEARANCE", "Sudden appearance",
+                        "Object suddenly appeared"),
+    RESTRICTED_AREA: ("Restricted Area", 2, "TEMPORAL ANOMALY", "Long presence in restricted area",
+                      "Object in restricted area for {value:.2f} seconds"),
+    RAPID_MOVEMENT: ("Rapid Movement", 2, "RAPID MOVEMENT", "Rapid movement detected",
+                     "Object moved {value:.2f} pixels"),
+    UNUSUAL_SIZE: ("Unusual Size", 1, "LARGE OBJECT", "Unusually large object detected",
+                   "Unusually large object detected"),
+    LOITERING: ("Loitering", 2, "LOITERING", "Loitering detected for {value:.2f} seconds",
+                "Person loitering for {value:.2f} seconds"),
+}
+OVERLAY_RULES = (RESTRICTED_AREA, RAPID_MOVEMENT, UNUSUAL_SIZE, LOITERING)  # Drawn next to SUDDEN APPEARANCE
+INSTANT_RULES = (SUDDEN_APPEARANCE, RAPID_MOVEMENT)  # Start on their first frame instead of anomaly_min_frames
+
+
+def load_config_file(path):
+    # Reads ssconfig.yaml style YAML files as well as preset JSON files
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise RuntimeError("PyYAML is required to read YAML config files (pip install PyYAML)")
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+def fit_frame(frame, size):
+    # Scale an annotated frame to fit size = (width, height), keeping its aspect ratio
+    if size is None:
+        return frame
+    height, width = frame.shape[:2]
+    scale = min(size[0] / width, size[1] / height)
+    new_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    if new_size == (width, height):
+        return frame
+    return cv2.resize(frame, new_size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+
+
+def push_filter(model, engines):
+    # Lets the backend drop unwanted classes and scores inside NMS. A shared
+    # model keeps the union of the cameras' classes at their lowest threshold;
+    # each engine still applies its own per-class thresholds afterwards.
+    set_filter = getattr(model, 'set_filter', None)
+    if set_filter is None:
+        return
+    filters = [engine.model_filter() for engine in engines]
+    set_filter(np.unique(np.concatenate([class_ids for class_ids, _ in filters])),
+               min(conf for _, conf in filters))
+
+
+class DetectionEngine:
+    # Detection, anomaly, recording and notification logic shared by the
+    # CustomTkinter front end and the headless runner. Nothing in here touches Tk.
+    def __init__(self, db_path='security_camera.db', recordings_folder='recordings', camera_id=None, db_manager=None):
+        self.camera_id = camera_id
+
+        # Initialize variables for object detection
+        self.model = None  # A detector backend, see backends.py
+        self.model_backend = DEFAULT_BACKEND  # 'torch', 'onnxruntime' or 'opencv'
+        self.model_weights = None  # Local weights file, models/yolov5s.pt (.onnx for exported backends) by default
+        self.model_repo = None  # Local YOLOv5 checkout; the torch.hub cache is used when unset
+        self.model_optimization = 'none'  # 'torchscript' (torch) or 'int8' (onnxruntime), cached under models/cache
+        self.inference_size = 640  # Square letterboxed model input, independent of the source and display size
+        self.warmup_size = WARMUP_SIZE
+        self.loader = None
+        self.metrics_path = 'startup_metrics.csv'
+        self.cold_start_time = None
+        self.detection_classes = ["person", "vehicle", "animal"]  # Class names or CLASS_GROUPS keys, see detections.py
+        self.confidence_threshold = 0.5  # Default confidence threshold
+        self.class_confidence = {}  # Per class or group thresholds, e.g. {'person': 0.4, 'vehicle': 0.6}
+        self.class_names = {}
+        self.class_names_model = None
+        self.class_ids = None
+        self.class_table = None
+        self.class_filter_key = None
+
+        # Initialize variables for the restricted area, in source frame pixels
+        self.restricted_area = None
+
+        # Initialize recording variables
+        self.automatic_recording_enabled = False
+        self.is_recording = False
+        self.out = None
+        self.recording_start_time = None
+        self.recordings_folder = recordings_folder
+        self.recording_duration = 30  # Duration in seconds for each automatic recording
+        self.source_fps = 0
+        self.source_size = None
+        self.source_start_time = None  # time.time() when the current source was opened
+
+        # Create recordings folder if it doesn't exist
+        if not os.path.exists(self.recordings_folder):
+            os.makedirs(self.recordings_folder)
+
+        # Initialize object detection variables
+        self.tracker = MultiObjectTracker()
+        self.anomaly_rules = AnomalyRules()  # Per-track timers and last boxes for the anomaly rules
+        self.anomaly_events = {rule: EventTable() for rule in ANOMALY_EVENTS}  # Keyed by track id
+        self.disappearances = EventTable()
+        self.interactions = EventTable()  # Keyed by pair_keys of the two track ids
+
+        # Initialize anomaly detection variables
+        self.anomaly_detection_enabled = False
+        self.anomaly_threshold_time = 5  # Time in seconds before an object in the restricted area is considered an anomaly
+        self.rapid_movement_threshold = 50  # Pixel distance to consider as rapid movement
+        self.sudden_appearance_threshold = 3  # Frames to consider an object as suddenly appeared
+        self.interaction_distance_threshold = 50  # Pixel distance to consider objects as interacting
+        self.loitering_threshold = 30  # Time in seconds to consider as loitering
+        self.anomaly_min_frames = 3  # Frames a condition has to hold before it is an anomaly event
+        self.anomaly_end_frames = 10  # Frames without the condition before its event ends
+        self.frame_count = 0
+
+        # Adaptive frame skip: the stride follows the measured processing time
+        self.adaptive_skip_enabled = False
+        self.target_fps = None  # Optional cap on processed frames per second
+        self.skip_controller = FrameSkipController(camera_id, log_path='frame_skip_decisions.csv')
+
+        # Motion gate: static frames reuse the last detections instead of running the detector
+        self.motion_gate_enabled = False
+        self.motion_method = 'mog2'  # or 'difference'
+        self.motion_threshold = 0.002  # Fraction of changed pixels in the downscaled frame
+        self.motion_gate = None
+        self.frame_gated = False
+        self.last_detections = empty_detections()
+
+        # Keyframe mode: the detector runs every keyframe_interval frames (1 = every
+        # frame) and optical flow carries its boxes across the frames in between
+        self.keyframe_interval = 1
+        self.propagator = KeyframePropagator()
+
+        # Zone-only inference: the detector sees the restricted area plus a margin,
+        # with a full-frame pass every roi_full_frame_interval detector runs
+        self.roi_inference_enabled = False
+        self.roi_margin = 0.25  # Added on every side, as a fraction of the zone's width/height
+        self.roi_full_frame_interval = 10
+        self.roi_runs = 0
+        self.roi_crop = None
+        self.outside_detections = empty_detections()
+        self.inference_pixels = 0
+        self.frame_pixels = 0
+
+        # Tiled inference for high-resolution sources: overlapping tiles run as one
+        # batch (or across tile_workers threads) and are merged with cross-tile NMS
+        self.tiled_inference_enabled = False
+        self.tile_size = None  # Defaults to inference_size
+        self.tile_overlap = 0.2
+        self.tile_workers = 0
+        self.tiler = TiledDetector()
+
+        # Database setup; rows are written in batches by a background writer
+        self.db_path = db_path
+        self.owns_db_manager = db_manager is None
+        if db_manager is None:
+            db_manager = DatabaseManager(self.db_path)
+            db_manager.setup_database()
+            db_manager.start_writer()
+        self.db_manager = db_manager
+
+        # Email and notification settings
+        self.email_settings = {
+            'smtp_server': 'smtp.gmail.com',
+            'smtp_port': 587,
+            'sender_email': '',
+            'sender_password': '',
+            'recipient_email': '',
+            'use_tls': True
+        }
+
+        self.notification_settings = {
+            'notify_on_anomaly': True,
+            'notify_on_detection_threshold': 10,
+            # Minimum seconds between two mails of the same alert type; alerts in between are coalesced
+            'rate_limits': {'anomaly': 60, 'detection_threshold': 300}
+        }
+        self.notifier = NotificationDispatcher(self.email_settings, self.notification_settings['rate_limits'])
+        self.notifier.start()
+
+        # Front-end hooks, called from the processing thread
+        self.on_anomaly = None
+        self.on_recording_stopped = None
+
+    def create_loader(self, on_error=None):
+        self.loader = ModelLoader(self.model_backend, self.model_weights, self.model_repo, self.warmup_size,
+                                  on_loaded=self.set_model, on_error=on_error,
+                                  optimization=self.model_optimization, input_size=self.inference_size)
+        return self.loader
+
+    def set_model(self, model):
+        self.model = model
+
+    def load_yolo_model(self):
+        loader = self.create_loader()
+        loader.run()
+        if loader.error is not None:
+            raise loader.error
+
+    def load_yolo_model_async(self, on_error=None):
+        # Frames are processed without detections until the model is ready
+        loader = self.create_loader(on_error)
+        loader.start()
+        return loader
+
+    def apply_settings(self, settings):
+        # Accepts both preset JSON files and ssconfig.yaml style dictionaries
+        for attr in SETTING_KEYS:
+            if attr in settings:
+                setattr(self, attr, settings[attr])
+
+        if 'recording_enabled' in settings:
+            self.automatic_recording_enabled = bool(settings['recording_enabled'])
+
+        area = settings.get('restricted_area')
+        if settings.get('restricted_area_enabled', True) is False:
+            self.restricted_area = None
+        elif isinstance(area, dict):
+            self.restricted_area = (int(area['top_left_x']), int(area['top_left_y']),
+                                    int(area['bottom_right_x']), int(area['bottom_right_y']))
+        elif area:
+            self.restricted_area = tuple(map(int, area))
+
+        # Returns True when the model has to be loaded again for the new settings
+        model_config = (self.model_backend, self.model_weights, self.model_repo, self.model_optimization,
+                        self.inference_size)
+        self.model_backend = settings.get('model_backend') or self.model_backend
+        self.model_weights = settings.get('model_weights', self.model_weights)
+        self.model_repo = settings.get('model_repo', self.model_repo)
+        self.model_optimization = settings.get('model_optimization') or self.model_optimization
+        self.inference_size = int(settings.get('inference_size') or self.inference_size)
+        return model_config != (self.model_backend, self.model_weights, self.model_repo, self.model_optimization,
+                                self.inference_size)
+
+    def get_current_settings(self):
+        settings = {attr: getattr(self, attr) for attr in SETTING_KEYS}
+        settings['model_backend'] = self.model_backend
+        settings['model_weights'] = self.model_weights
+        settings['model_optimization'] = self.model_optimization
+        settings['inference_size'] = self.inference_size
+        if self.restricted_area:
+            x1, y1, x2, y2 = self.restricted_area
+            settings['restricted_area'] = {
+                'top_left_x': x1,
+                'top_left_y': y1,
+                'bottom_right_x': x2,
+                'bottom_right_y': y2
+            }
+        return settings
+
+    def start_source(self, fps):
+        self.close_anomaly_events()
+        self.source_start_time = time.time()
+        self.source_fps = fps
+        self.source_size = None
+        self.last_detections = empty_detections()
+        self.propagator.reset()
+        self.skip_controller.reset(fps)
+        self.roi_runs = 0
+        self.outside_detections = empty_detections()
+
+    def process_frame(self, frame, annotate=True):
+        frame = self.prepare_frame(frame)
+        if frame is None:
+            return None
+        if self.should_detect(frame):
+            start = time.perf_counter()
+            detections = self.detect_objects(frame)
+            if self.motion_gate is not None:
+                self.motion_gate.observe_detection(time.perf_counter() - start)
+            self.set_keyframe(frame, detections)
+        else:
+            self.carry_detections(frame)
+        # Gated frames go through the tracker with the previous detections, so
+        # objects in a static scene stay "seen" instead of disappearing
+        return self.finish_frame(frame, self.last_detections, annotate)
+
+    def should_detect(self, frame):
+        self.frame_gated = False
+        if self.model is None:
+            return True
+        if self.motion_gate_enabled:
+            if self.motion_gate is None or self.motion_gate.method != self.motion_method:
+                self.motion_gate = MotionGate(self.motion_method)
+            self.motion_gate.threshold = self.motion_threshold
+            if not self.motion_gate.should_detect(frame):
+                self.frame_gated = True
+                return False
+        if self.keyframe_interval > 1:
+            self.propagator.interval = self.keyframe_interval
+            return self.propagator.due()
+        return True
+
+    def set_keyframe(self, frame, detections):
+        self.last_detections = detections
+        if self.keyframe_interval > 1:
+            self.propagator.start(frame, detections)
+
+    def carry_detections(self, frame):
+        # Between keyframes the boxes follow the scene; a static (gated) frame keeps them as they are
+        if self.keyframe_interval > 1 and not self.frame_gated and self.propagator.active:
+            self.last_detections = self.propagator.propagate(frame)
+
+    def prepare_frame(self, frame):
+        self.frame_count += 1
+
+        # Write frame if recording; recordings keep every frame, skipped or not
+        self.source_size = (frame.shape[1], frame.shape[0])
+        if self.is_recording and self.out is not None:
+            self.out.write(frame)
+
+        if self.adaptive_skip_enabled:
+            self.skip_controller.target_fps = self.target_fps
+            self.skip_controller.allow_resize = getattr(self.model, 'resizable', False)
+            if not self.skip_controller.should_process():
+                return None
+
+        # Detection runs on the source resolution; the backend letterboxes to
+        # inference_size and the front end scales for display when it paints
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def finish_frame(self, frame, detections, annotate=True):
+        # Check for anomalies
+        if self.anomaly_detection_enabled:
+            self.detect_anomalies(frame, detections)
+
+        # Draw bounding boxes and labels
+        if annotate:
+            frame = self.draw_boxes(frame, detections)
+        return frame, detections
+
+    def detect_objects(self, frame):
+        if self.model is None:
+            return empty_detections()
+
+        image, region, size = self.detection_input(frame)
+        push_filter(self.model, [self])
+        if self.use_tiles(image):
+            detections = self.tiler.detect(self.model, image)
+        else:
+            detections = self.model.detect([image], size)[0]
+        # First frame the model actually ran on; engines fed by MultiCameraEngine
+        # have no loader and it reports for them
+        if self.cold_start_time is None and self.loader is not None:
+            self.cold_start_time = report_cold_start(self.loader, self.metrics_path, self.source_start_time)
+        return self.finish_detections(detections, region)
+
+    def use_tiles(self, image):
+        if not self.tiled_inference_enabled:
+            return False
+        self.tiler.tile_size = int(self.tile_size or self.inference_size)
+        self.tiler.overlap = self.tile_overlap
+        self.tiler.workers = int(self.tile_workers)
+        return self.tiler.needs_tiling(image)
+
+    def detect_size(self):
+        # None keeps the backend's own input size
+        if self.adaptive_skip_enabled and self.skip_controller.allow_resize and self.skip_controller.size_index:
+            return min(self.skip_controller.input_size, self.inference_size)
+        return None
+
+    def roi_region(self, frame):
+        # Restricted area plus margin, clipped to the frame; None means the whole frame
+        if not self.roi_inference_enabled or not self.restricted_area:
+            return None
+        height, width = frame.shape[:2]
+        x1, y1, x2, y2 = self.restricted_area
+        margin_x, margin_y = (x2 - x1) * self.roi_margin, (y2 - y1) * self.roi_margin
+        region = (max(0, int(x1 - margin_x)), max(0, int(y1 - margin_y)),
+                  min(width, int(x2 + margin_x)), min(height, int(y2 + margin_y)))
+        if region[2] - region[0] < 32 or region[3] - region[1] < 32:
+            return None
+        return region
+
+    def detection_input(self, frame):
+        # (image, crop region or None, input size) for the next detector run
+        size = self.detect_size()
+        self.roi_crop = self.roi_region(frame)
+        height, width = frame.shape[:2]
+        self.frame_pixels += height * width
+        full_pass = self.roi_crop is None or self.roi_runs % max(1, self.roi_full_frame_interval) == 0
+        self.roi_runs += 1
+        if full_pass:
+            self.inference_pixels += height * width
+            return frame, None, size
+
+        x1, y1, x2, y2 = self.roi_crop
+        self.inference_pixels += (x2 - x1) * (y2 - y1)
+        if getattr(self.model, 'resizable', False):
+            # Keep the full-frame pixel density: a crop half as wide gets half the input size
+            base = size or self.inference_size
+            size = max(64, int(np.ceil(base * max(x2 - x1, y2 - y1) / max(width, height) / 32)) * 32)
+        return frame[y1:y2, x1:x2], self.roi_crop, size
+
+    def finish_detections(self, detections, region):
+        if region is not None:
+            # Crop pixels back to frame pixels
+            detections = detections.copy()
+            detections[:, [XMIN, XMAX]] += region[0]
+            detections[:, [YMIN, YMAX]] += region[1]
+        detections = self.filter_detections(detections)
+        if self.roi_crop is None:
+            return detections
+
+        # Objects outside the crop keep their boxes from the last full-frame pass
+        x1, y1, x2, y2 = self.roi_crop
+        center_x = (detections[:, XMIN] + detections[:, XMAX]) / 2
+        center_y = (detections[:, YMIN] + detections[:, YMAX]) / 2
+        if region is None:
+            outside = (center_x < x1) | (center_x > x2) | (center_y < y1) | (center_y > y2)
+            self.outside_detections = detections[outside]
+            return detections
+        # An object on the crop edge is found again by the crop pass; keep one box
+        outside = self.outside_detections
+        outside = outside[~overlaps_any(outside, detections)]
+        return np.concatenate((detections, outside))
+
+    def get_class_names(self):
+        if self.model is not self.class_names_model:
+            self.class_names = class_names_of(self.model)
+            self.class_names_model = self.model
+        return self.class_names
+
+    def update_class_filter(self):
+        # Cached until the class filter, the thresholds or the model change
+        key = (tuple(self.detection_classes), self.confidence_threshold,
+               tuple(sorted((self.class_confidence or {}).items())), id(self.model))
+        if key != self.class_filter_key:
+            class_names = self.get_class_names()
+            self.class_ids = class_ids_for(self.detection_classes, class_names)
+            self.class_table = confidence_table(self.class_ids, self.confidence_threshold,
+                                                self.class_confidence, class_names)
+            self.class_filter_key = key
+
+    def model_filter(self):
+        # Classes and the lowest threshold the model's NMS may drop below
+        self.update_class_filter()
+        finite = self.class_table[np.isfinite(self.class_table)]
+        return self.class_ids, float(finite.min()) if len(finite) else self.confidence_threshold
+
+    def class_name(self, detection):
+        return self.get_class_names().get(int(detection[CLS]), str(int(detection[CLS])))
+
+    def filter_detections(self, detections):
+        self.update_class_filter()
+        filtered_detections = detections[passes_confidence(detections, self.class_table)]
+
+        # Log each detection to the database
+        for detection in filtered_detections:
+            self.db_manager.log_detection(self.class_name(detection), float(detection[CONF]), box_of(detection), self.frame_count, self.camera_id)
+
+        # Check and send notifications
+        self.check_and_send_notifications(filtered_detections, [])  # Pass an empty list for anomalies for now
+
+        return filtered_detections
+
+    def detect_anomalies(self, frame, detections):
+        anomalies = []
+
+        # Stable ids across frames, so per-object timers can accumulate
+        track_ids = self.tracker.update(detections)
+        person = {name: class_id for class_id, name in self.get_class_names().items()}.get('person', -1)
+        now = time.time()
+        result = self.anomaly_rules.evaluate(
+            detections, track_ids, self.frame_count, now, frame.shape[0] * frame.shape[1],
+            self.restricted_area, person, self.sudden_appearance_threshold, self.anomaly_threshold_time,
+            self.rapid_movement_threshold, self.loitering_threshold, self.tracker.removed_ids)
+
+        # Only the flagged boxes are visited in Python, to draw them
+        for i in np.flatnonzero(result.flags):
+            detection, flags = detections[i], result.flags[i]
+            if flags & SUDDEN_APPEARANCE:
+                self.draw_anomaly(frame, detection, ANOMALY_EVENTS[SUDDEN_APPEARANCE][2])
+            # One of the other rules per box and frame, in this order
+            rule = next((rule for rule in OVERLAY_RULES if flags & rule), None)
+            if rule is not None:
+                self.draw_anomaly(frame, detection, ANOMALY_EVENTS[rule][2])
+
+        # Each rule's hits feed its events; only starting events are logged
+        values = {RESTRICTED_AREA: result.dwell, RAPID_MOVEMENT: result.movement, LOITERING: result.loitering}
+        thresholds = {RESTRICTED_AREA: self.anomaly_threshold_time, LOITERING: self.loitering_threshold}
+        for rule, (anomaly_type, severity, _, message, description) in ANOMALY_EVENTS.items():
+            hit = np.flatnonzero(result.flags & rule)
+            value = values[rule][hit] if rule in values else np.full(len(hit), np.nan)
+            levels = np.full(len(hit), severity)
+            if rule in thresholds:
+                # Twice the threshold and more counts as one level more severe
+                levels[value > 2 * thresholds[rule]] += 1
+            started, event_ids, ended = self.anomaly_events[rule].update(
+                track_ids[hit], self.frame_count, now, levels, value,
+                1 if rule in INSTANT_RULES else self.anomaly_min_frames, self.anomaly_end_frames)
+            for k, event_id in zip(np.flatnonzero(started), event_ids):
+                detection = detections[hit[k]]
+                anomalies.append(self.log_anomaly(self.class_name(detection), message.format(value=value[k])))
+                self.db_manager.log_anomaly(anomaly_type, description.format(value=value[k]), box_of(detection),
+                                            self.frame_count, int(levels[k]), self.camera_id, event_id)
+            self.close_events(ended, description)
+
+        # Check for sudden disappearances, once per track
+        started, _, _ = self.disappearances.update(result.disappeared_ids, self.frame_count, now, 0,
+                                                   gap=self.anomaly_end_frames)
+        for class_id in result.disappeared_classes[started]:
+            anomalies.append(self.log_anomaly(self.get_class_names().get(int(class_id), str(int(class_id))), "Sudden disappearance"))
+
+        # Check for object interactions
+        anomalies.extend(self.check_object_interactions(frame, detections, track_ids, now))
+
+        # Start recording if an anomaly is detected and automatic recording is enabled
+        if result.any() and self.automatic_recording_enabled and not self.is_recording:
+            self.start_recording()
+
+        # Stop recording if no anomaly is detected for the past recording_duration seconds
+        if self.is_recording and time.time() - self.recording_start_time > self.recording_duration:
+            self.stop_recording()
+
+        # Check and send notifications for anomalies
+        self.check_and_send_notifications(detections, anomalies)
+
+    def check_object_interactions(self, frame, detections, track_ids, now):
+        # Only boxes in neighbouring grid cells are compared; a pair is drawn
+        # for as long as it stays close and logged once per interaction event
+        first, second, _ = close_pairs(centers(detections), self.interaction_distance_threshold)
+        pairs = []
+        for i, j in zip(first, second):
+            detection1, detection2 = detections[i], detections[j]
+            name1, name2 = self.class_name(detection1), self.class_name(detection2)
+            if name2 == 'person' and name1 != 'person':
+                detection1, detection2, name1, name2 = detection2, detection1, name2, name1
+            interaction_type = self.classify_interaction(name1, name2)
+            if interaction_type == "Person-Object" and name2 in SUSPICIOUS_OBJECTS:
+                self.draw_interaction(frame, detection1, detection2, "SUSPICIOUS")
+                pairs.append((detection1, name1, 3, "Suspicious Interaction",
+                              f"Suspicious interaction: Person with {name2}", f"Person interacting with {name2}"))
+            else:
+                self.draw_interaction(frame, detection1, detection2, interaction_type)
+                pairs.append((detection1, name1, 1, "Object Interaction",
+                              f"Interaction detected: {interaction_type} with {name2}", f"{interaction_type} interaction detected"))
+
+        started, event_ids, ended = self.interactions.update(
+            pair_keys(track_ids[first], track_ids[second]), self.frame_count, now,
+            [pair[2] for pair in pairs], min_frames=self.anomaly_min_frames, gap=self.anomaly_end_frames)
+        messages = []
+        for k, event_id in zip(np.flatnonzero(started), event_ids):
+            detection, name, severity, anomaly_type, message, description = pairs[k]
+            messages.append(self.log_anomaly(name, message))
+            self.db_manager.log_anomaly(anomaly_type, description, box_of(detection), self.frame_count, severity,
+                                        self.camera_id, event_id)
+        self.close_events(ended)
+        return messages
+
+    def close_events(self, ended, description=None):
+        # Completes the database rows of ended events with their duration and
+        # peak severity; {value} in the description gets the peak value
+        for event_id, end_time, duration, end_frame, severity, value in zip(
+                ended.event_ids, ended.end_times, ended.durations, ended.end_frames, ended.peak_severity,
+                ended.peak_values):
+            self.db_manager.close_anomaly(event_id, end_time, duration, int(end_frame), int(severity),
+                                          description.format(value=value) if description else None)
+
+    def close_anomaly_events(self):
+        # Events still open when the source changes or the engine shuts down end here
+        for rule, table in self.anomaly_events.items():
+            self.close_events(table.close_all(), ANOMALY_EVENTS[rule][4])
+        self.close_events(self.interactions.close_all())
+        self.disappearances.close_all()
+
+    def classify_interaction(self, name1, name2):
+        if name1 == 'person' and name2 == 'person':
+            return "Person-Person"
+        elif 'person' in [name1, name2]:
+            return "Person-Object"
+        else:
+            return "Object-Object"
+
+    def draw_interaction(self, frame, detection1, detection2, interaction_type):
+        x1, y1 = int((detection1[XMIN] + detection1[XMAX]) / 2), int((detection1[YMIN] + detection1[YMAX]) / 2)
+        x2, y2 = int((detection2[XMIN] + detection2[XMAX]) / 2), int((detection2[YMIN] + detection2[YMAX]) / 2)
+        cv2.line(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
+        cv2.putText(frame, interaction_type, (min(x1, x2), min(y1, y2) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (255, 0, 0), 2)
+
+    def log_anomaly(self, name, anomaly_type):
+        anomaly_msg = f"Anomaly detected: {name} - {anomaly_type} at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        if self.on_anomaly is not None:
+            self.on_anomaly(anomaly_msg)
+        print(anomaly_msg)  # For console logging
+        return anomaly_msg
+
+    def draw_anomaly(self, frame, detection, anomaly_type):
+        xmin, ymin, xmax, ymax = box_of(detection)
+        cv2.rectangle(frame, (xmin, ymin), (xmax, ymax), (0, 0, 255), 2)  # Red box for anomalies
+        cv2.putText(frame, anomaly_type, (xmin, ymin - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+
+    def draw_boxes(self, frame, detections):
+        img = Image.fromarray(frame)
+        draw = ImageDraw.Draw(img, 'RGBA')
+
+        # Load a larger font
+        try:
+            font = ImageFont.truetype("arial.ttf", 20)  # Adjust size as needed
+        except IOError:
+            font = ImageFont.load_default()
+
+        for detection in detections:
+            label = f"{self.class_name(detection)} {detection[CONF]:.2f}"
+            box = [float(v) for v in detection[BOX]]
+
+            # Define colors
+            highlight_color = (255, 0, 0, 64) if self.is_in_restricted_area(detection) else (200, 200, 200, 64)  # Light grey for normal detections
+            text_color = (255, 255, 255, 255)  # White color for text
+
+            # Draw semi-transparent rectangle
+            draw.rectangle(box, fill=highlight_color)
+
+            # Calculate text position and size
+            left, top, right, bottom = draw.textbbox((box[0], box[1]), label, font=font)
+            text_width = right - left
+            text_height = bottom - top
+            text_position = (box[0], box[1] - text_height - 5)
+
+            # Draw text background
+            draw.rectangle([text_position[0], text_position[1],
+                            text_position[0] + text_width, text_position[1] + text_height],
+                        fill=(0, 0, 0, 128))  # Semi-transparent black background
+
+            # Draw text
+            draw.text(text_position, label, font=font, fill=text_color)
+
+        return np.array(img)
+
+    def is_in_restricted_area(self, detection):
+        if not self.restricted_area:
+            return False
+        x1, y1, x2, y2 = self.restricted_area
+        xmin, ymin, xmax, ymax = detection[XMIN], detection[YMIN], detection[XMAX], detection[YMAX]
+        return (xmin > x1 and ymin > y1 and xmax < x2 and ymax < y2)
+
+    def start_recording(self):
+        if self.source_size is None:
+            print("Error: No video source selected.")
+            return
+
+        self.is_recording = True
+        self.recording_start_time = time.time()
+        filename = f"anomaly_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+        if self.camera_id is not None:
+            filename = f"anomaly_{self.camera_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.mp4"
+        filepath = os.path.join(self.recordings_folder, filename)
+
+        fps = self.source_fps or 30.0
+        width, height = self.source_size
+
+        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+        self.out = cv2.VideoWriter(filepath, fourcc, fps, (width, height))
+
+        print(f"Started automatic recording: {filename}")
+
+    def stop_recording(self):
+        if self.is_recording:
+            self.is_recording = False
+            if self.out is not None:
+                self.out.release()
+                self.out = None
+
+            duration = time.time() - self.recording_start_time
+            print(f"Stopped automatic recording. Duration: {duration:.2f} seconds")
+
+            if self.on_recording_stopped is not None:
+                self.on_recording_stopped()
+
+    def close(self):
+        self.close_anomaly_events()
+        self.stop_recording()
+        self.tiler.close()
+        self.notifier.stop()
+        if self.owns_db_manager:
+            self.db_manager.close()
+
+    def send_email_notification(self, subject, body, alert_type='general'):
+        # Queued for the notification thread, which rate-limits and sends it
+        if self.camera_id is not None:
+            subject = f"[{self.camera_id}] {subject}"
+        self.notifier.notify(alert_type, subject, body)
+
+    def check_and_send_notifications(self, detections, anomalies):
+        if self.notification_settings['notify_on_anomaly'] and anomalies:
+            subject = "Security Alert: Anomaly Detected"
+            body = f"An anomaly has been detected:\n\n{anomalies[-1]}"
+            self.send_email_notification(subject, body, 'anomaly')
+
+        if len(detections) >= self.notification_settings['notify_on_detection_threshold']:
+            subject = "Security Alert: Detection Threshold Reached"
+            body = f"The number of detections has reached the threshold of {self.notification_settings['notify_on_detection_threshold']}."
+            self.send_email_notification(subject, body, 'detection_threshold')
+
+
+class MultiCameraEngine:
+    # Runs several sources through one shared model. Every camera keeps its own
+    # DetectionEngine (tracker, restricted area, recording state) and FrameReader;
+    # the frames that are ready at the same time go through the model as one batch.
+    def __init__(self, db_path='security_camera.db', recordings_folder='recordings'):
+        self.db_path = db_path
+        self.recordings_folder = recordings_folder
+        self.db_manager = DatabaseManager(db_path)
+        self.db_manager.setup_database()
+        self.db_manager.start_writer()
+        self.model = None
+        self.loader = None
+        self.cold_start_time = None
+        self.cameras = []
+        self.engines = []  # Every camera ever added, for the motion gate totals
+        self.batches = 0
+        self.frames_processed = 0
+        self.last_batch_time = 0.0
+
+    def load_yolo_model(self, backend=DEFAULT_BACKEND, weights=None, repo_dir=None, warmup_size=WARMUP_SIZE,
+                        metrics_path='startup_metrics.csv', optimization='none', input_size=640):
+        # Warmed up with one frame per camera, the batch size step() will use
+        self.loader = ModelLoader(backend, weights, repo_dir, warmup_size, max(1, len(self.cameras)),
+                                  optimization=optimization, input_size=input_size)
+        self.loader.run()
+        if self.loader.error is not None:
+            raise self.loader.error
+        self.model = self.loader.model
+        self.metrics_path = metrics_path
+        for camera in self.cameras:
+            camera['engine'].model = self.model
+
+    def add_camera(self, camera_id, cap, is_live, settings=None, buffer_size=4):
+        engine = DetectionEngine(self.db_path, self.recordings_folder, camera_id=camera_id, db_manager=self.db_manager)
+        engine.model = self.model
+        if settings:
+            engine.apply_settings(settings)
+        engine.start_source(cap.get(cv2.CAP_PROP_FPS))
+        self.engines.append(engine)
+        reader = FrameReader(cap, buffer_size, DROP_LATEST if is_live else DROP_NONE)
+        self.cameras.append({'id': camera_id, 'engine': engine, 'reader': reader, 'is_live': is_live})
+        return engine
+
+    def start(self):
+        for camera in self.cameras:
+            camera['reader'].start()
+
+    def gather_frames(self, timeout=0.05):
+        # Live cameras contribute whatever is ready; files wait for their next
+        # frame so that none are lost. Cameras whose source ended are dropped.
+        batch = []
+        for camera in list(self.cameras):
+            reader = camera['reader']
+            ret, frame = reader.read(timeout=0.0 if camera['is_live'] else timeout)
+            if ret:
+                batch.append((camera, frame))
+            elif reader.finished and not reader.ready_slots:
+                camera['engine'].close()
+                self.cameras.remove(camera)
+        return batch
+
+    def step(self, annotate=False):
+        batch = []
+        for camera, frame in self.gather_frames():
+            frame = camera['engine'].prepare_frame(frame)
+            if frame is not None:
+                batch.append((camera, frame))
+        if not batch:
+            time.sleep(0.005)
+            return []
+
+        # Only frames with motion that are due a keyframe go to the model; static ones reuse their
+        # camera's last detections and the rest are carried forward by optical flow
+        moving = [(camera, frame) for camera, frame in batch if camera['engine'].should_detect(frame)]
+        if moving:
+            start = time.perf_counter()
+            inputs = [camera['engine'].detection_input(frame) for camera, frame in moving]
+            detections = [empty_detections()] * len(moving)
+            if self.model is not None:
+                # High-resolution cameras in tiled mode run their own tile batch
+                batched = []
+                for i, ((camera, _), (image, _, _)) in enumerate(zip(moving, inputs)):
+                    if camera['engine'].use_tiles(image):
+                        push_filter(self.model, [camera['engine']])
+                        detections[i] = camera['engine'].tiler.detect(self.model, image)
+                    else:
+                        batched.append(i)
+                # Zone crops can need their own input size; one batch per size
+                for size in set(inputs[i][2] for i in batched):
+                    indices = [i for i in batched if inputs[i][2] == size]
+                    push_filter(self.model, [moving[i][0]['engine'] for i in indices])
+                    results = self.model.detect([inputs[i][0] for i in indices], size)
+                    for i, result in zip(indices, results):
+                        detections[i] = result
+            self.last_batch_time = time.perf_counter() - start
+            self.batches += 1
+            if self.cold_start_time is None and self.model is not None:
+                self.cold_start_time = report_cold_start(self.loader, self.metrics_path,
+                                                         min(engine.source_start_time for engine in self.engines))
+
+            for (camera, frame), (_, region, _), camera_detections in zip(moving, inputs, detections):
+                engine = camera['engine']
+                engine.set_keyframe(frame, engine.finish_detections(camera_detections, region))
+                if engine.motion_gate is not None:
+                    engine.motion_gate.observe_detection(self.last_batch_time / len(moving))
+        for camera, frame in batch:
+            if not any(camera is other for other, _ in moving):
+                camera['engine'].carry_detections(frame)
+
+        outputs = []
+        share = self.last_batch_time / len(moving) if moving else 0.0
+        for camera, frame in batch:
+            engine = camera['engine']
+            start = time.perf_counter()
+            outputs.append((camera['id'], engine.finish_frame(frame, engine.last_detections, annotate)))
+            self.frames_processed += 1
+            if engine.adaptive_skip_enabled:
+                # Each camera is charged its share of the batch plus its own post-processing
+                detect_time = share if any(camera is other for other, _ in moving) else 0.0
+                engine.skip_controller.observe(detect_time + time.perf_counter() - start,
+                                               camera['reader'].frames_dropped)
+        return outputs
+
+    def motion_stats(self):
+        # (fraction of frames that skipped the detector, detector seconds saved) over all cameras
+        gates = [engine.motion_gate for engine in self.engines if engine.motion_gate is not None]
+        checked = sum(gate.frames_checked for gate in gates)
+        gated = sum(gate.frames_gated for gate in gates)
+        return (gated / checked if checked else 0.0), sum(gate.cpu_saved for gate in gates)
+
+    def keyframe_stats(self):
+        # (fraction of frames that ran the detector, frames carried by optical flow,
+        # boxes the flow lost before the next keyframe) in keyframe mode
+        propagators = [engine.propagator for engine in self.engines if engine.keyframe_interval > 1]
+        keyframes = sum(propagator.keyframes for propagator in propagators)
+        propagated = sum(propagator.frames_propagated for propagator in propagators)
+        lost = sum(propagator.boxes_lost for propagator in propagators)
+        total = keyframes + propagated
+        return (keyframes / total if total else 0.0), propagated, lost
+
+    def roi_stats(self):
+        # Share of frame pixels the detector actually saw, over cameras with zone-only inference
+        engines = [engine for engine in self.engines if engine.roi_inference_enabled and engine.frame_pixels]
+        frame_pixels = sum(engine.frame_pixels for engine in engines)
+        return sum(engine.inference_pixels for engine in engines) / frame_pixels if frame_pixels else None
+
+    def tile_stats(self):
+        # (frames run as tiles, tiles per tiled frame) over all cameras
+        frames = sum(engine.tiler.frames_tiled for engine in self.engines)
+        tiles = sum(engine.tiler.tiles_run for engine in self.engines)
+        return frames, (tiles / frames if frames else 0.0)
+
+    def skip_summary(self):
+        # ", frame skip cam0 1/3 ..." for cameras running the adaptive frame skip
+        strides = [f"{camera['id']} 1/{camera['engine'].skip_controller.stride}" for camera in self.cameras
+                   if camera['engine'].adaptive_skip_enabled]
+        return f", frame skip {' '.join(strides)}" if strides else ""
+
+    def is_running(self):
+        return bool(self.cameras)
+
+    def stop(self):
+        for camera in self.cameras:
+            camera['reader'].stop()
+            camera['engine'].close()
+        self.cameras = []
+        self.db_manager.close()
+
+
+class FrameProcessor(threading.Thread):
+    # Owns the video capture and runs the detection pipeline off the Tk thread.
+    # Finished frames go into a small mailbox that the UI only polls and paints.
+    def __init__(self, engine, cap, drop_policy, buffer_size=4, mailbox_size=2):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.cap = cap
+        self.reader = FrameReader(cap, buffer_size, drop_policy)
+        self.mailbox = queue.Queue(maxsize=mailbox_size)
+        self.stop_event = threading.Event()
+        self.paused = False
+        self.display_size = None  # Published frames are scaled to fit this (width, height)
+        self.frames_processed = 0
+        self.frames_dropped = 0
+        self.last_processing_time = 0.0
+
+    def run(self):
+        self.engine.start_source(self.cap.get(cv2.CAP_PROP_FPS))
+        self.reader.start()
+        try:
+            while not self.stop_event.is_set():
+                if self.paused:
+                    time.sleep(0.01)
+                    continue
+
+                ret, frame = self.reader.read()
+                if not ret:
+                    break
+
+                start = time.perf_counter()
+                result = self.engine.process_frame(frame)
+                self.last_processing_time = time.perf_counter() - start
+
+                if result is not None:
+                    self.frames_processed += 1
+                    if self.engine.adaptive_skip_enabled:
+                        self.engine.skip_controller.observe(self.last_processing_time, self.reader.frames_dropped)
+                    frame_with_boxes, _ = result
+                    self.publish((self.engine.frame_count, fit_frame(frame_with_boxes, self.display_size)))
+        except Exception as e:
+            print(f"Frame processing stopped: {str(e)}")
+        finally:
+            # The reader releases the capture once it has stopped decoding
+            self.reader.stop()
+
+    def publish(self, result):
+        # Latest frame wins: drop the oldest entry when the UI falls behind
+        while True:
+            try:
+                self.mailbox.put_nowait(result)
+                return
+            except queue.Full:
+                try:
+                    self.mailbox.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get_latest(self):
+        result = None
+        while True:
+            try:
+                result = self.mailbox.get_nowait()
+            except queue.Empty:
+                return result
+
+    def stop(self, timeout=2.0):
+        self.stop_event.set()
+        self.reader.stop(timeout)
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
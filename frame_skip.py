@@ -0,0 +1,118 @@
+import csv
+import math
+import os
+from datetime import datetime
+
+INPUT_SIZES = (640, 512, 416, 320)
+
+
+class FrameSkipController:
+    # Closed-loop replacement for the fixed "process every 3rd frame" mode.
+    #
+    # Processing one frame in every `stride` keeps up with the source when the
+    # measured processing time fits in stride / source_fps seconds (with some
+    # headroom). Every `window` processed frames the controller compares the
+    # two: it raises the stride at once when the camera falls behind (or when
+    # the reader had to drop live frames), and lowers it one step at a time
+    # after `calm_windows` windows with spare time. When even max_stride is not
+    # enough and the model supports it, the inference input size is reduced.
+    #
+    # Decisions are printed and, with log_path set, appended to a CSV file.
+    def __init__(self, camera_id=None, target_fps=None, max_stride=8, window=15, headroom=0.85,
+                 calm_windows=3, allow_resize=False, log_path=None):
+        self.camera_id = camera_id
+        self.target_fps = target_fps  # Upper bound on processed frames per second; None = source rate
+        self.max_stride = max_stride
+        self.window = window
+        self.headroom = headroom
+        self.calm_windows = calm_windows
+        self.allow_resize = allow_resize
+        self.log_path = log_path
+        self.reset()
+
+    def reset(self, source_fps=None):
+        self.source_fps = source_fps if source_fps and source_fps > 0 else 30.0
+        self.stride = 1
+        self.size_index = 0
+        self.counter = 0
+        self.samples = []
+        self.calm = 0
+        self.last_dropped = 0
+
+    @property
+    def input_size(self):
+        return INPUT_SIZES[self.size_index]
+
+    def should_process(self):
+        self.counter += 1
+        if self.counter >= self.stride:
+            self.counter = 0
+            return True
+        return False
+
+    def observe(self, seconds, dropped=None):
+        # seconds: processing time of one processed frame; dropped: the reader's
+        # running count of frames it had to throw away
+        self.samples.append(seconds)
+        if len(self.samples) < self.window:
+            return
+        average = sum(self.samples) / len(self.samples)
+        self.samples = []
+
+        behind = dropped is not None and dropped > self.last_dropped
+        if dropped is not None:
+            self.last_dropped = dropped
+
+        needed = math.ceil(average * self.source_fps / self.headroom)
+        if behind:
+            needed = max(needed, self.stride + 1)
+        # Only the processing time can shrink the input, the target_fps cap cannot
+        too_slow = needed > self.max_stride
+        if self.target_fps:
+            needed = max(needed, math.ceil(self.source_fps / self.target_fps))
+        needed = max(1, needed)
+
+        can_shrink = too_slow and self.allow_resize and self.size_index < len(INPUT_SIZES) - 1
+        if needed > self.stride and (self.stride < self.max_stride or can_shrink):
+            self.calm = 0
+            if can_shrink:
+                self.size_index += 1
+                self.decide(self.max_stride, average, "behind, smaller input")
+            else:
+                self.decide(min(needed, self.max_stride), average, "dropping frames" if behind else "behind")
+            return
+
+        # Share of the current budget in use; a larger input costs roughly twice as much
+        load = average * self.source_fps / (self.stride * self.headroom)
+        if needed >= self.stride and not (self.size_index and load < 0.5):
+            self.calm = 0
+            return
+        self.calm += 1
+        if self.calm < self.calm_windows:
+            return
+        self.calm = 0
+        if needed < self.stride:
+            self.decide(self.stride - 1, average, "spare time")
+        else:
+            self.size_index -= 1
+            self.decide(self.stride, average, "spare time, larger input")
+
+    def decide(self, stride, average, reason):
+        self.stride = stride
+        budget = self.stride / self.source_fps
+        camera = f"[{self.camera_id}] " if self.camera_id is not None else ""
+        print(f"{camera}Frame skip: processing 1 of every {self.stride} frames at input {self.input_size} "
+              f"({reason}; {average * 1000:.1f} ms/frame, budget {budget * 1000:.1f} ms)")
+        if self.log_path:
+            try:
+                is_new = not os.path.exists(self.log_path)
+                with open(self.log_path, 'a', newline='') as f:
+                    writer = csv.writer(f)
+                    if is_new:
+                        writer.writerow(['timestamp', 'camera_id', 'stride', 'input_size', 'processing_ms',
+                                         'budget_ms', 'source_fps', 'reason'])
+                    writer.writerow([datetime.now().isoformat(), self.camera_id or '', self.stride,
+                                     self.input_size, f"{average * 1000:.2f}", f"{budget * 1000:.2f}",
+                                     f"{self.source_fps:.2f}", reason])
+            except OSError as e:
+                print(f"Failed to write frame skip log: {str(e)}")
@@ -0,0 +1,192 @@
+import argparse
+import os
+import signal
+import sys
+import time
+
+from backends import BACKENDS, DEFAULT_BACKEND
+from capture import open_capture
+from model_cache import OPTIMIZATIONS
+from engine import MultiCameraEngine, load_config_file
+from model_loader import WARMUP_SIZE
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Smart Security Camera System without a GUI.")
+    parser.add_argument("--source", action="append",
+                        help="Video file path or webcam index; repeat for several cameras "
+                             "(defaults to the cameras list or video_path/use_webcam from the config)")
+    parser.add_argument("--config", default="ssconfig.yaml", help="ssconfig.yaml style config file")
+    parser.add_argument("--preset", help="Preset name from the presets folder or a path to a preset JSON file")
+    parser.add_argument("--db", default="security_camera.db", help="SQLite database path")
+    parser.add_argument("--recordings", default="recordings", help="Folder for automatic recordings")
+    parser.add_argument("--backend", choices=BACKENDS,
+                        help="Inference backend (defaults to model_backend from the config, then torch)")
+    parser.add_argument("--optimize", choices=OPTIMIZATIONS,
+                        help="Use a cached optimized model: torchscript (torch backend) or int8 (onnxruntime backend)")
+    parser.add_argument("--weights", help="Local YOLOv5 weights file (defaults to model_weights from the config, then models/yolov5s.pt)")
+    parser.add_argument("--model-repo", help="Local YOLOv5 checkout for offline loading (defaults to the torch.hub cache)")
+    parser.add_argument("--adaptive-skip", action="store_true",
+                        help="Skip frames adaptively so processing keeps up with the source (adaptive_skip_enabled in the config)")
+    parser.add_argument("--target-fps", type=float, help="With --adaptive-skip, process at most this many frames per second")
+    parser.add_argument("--keyframe-interval", type=int,
+                        help="Run the detector every N frames and carry boxes across the rest with optical flow "
+                             "(keyframe_interval in the config; 1 = every frame)")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="Skip the detector while the scene is static (motion_gate_enabled in the config)")
+    parser.add_argument("--roi-inference", action="store_true",
+                        help="Run the detector on the restricted area plus a margin, with periodic full-frame passes "
+                             "(roi_inference_enabled in the config)")
+    parser.add_argument("--tiles", action="store_true",
+                        help="Detect on overlapping tiles for high-resolution sources (tiled_inference_enabled in the "
+                             "config; tile_size, tile_overlap and tile_workers can be set per camera)")
+    parser.add_argument("--inference-size", type=int,
+                        help="Square model input size in pixels; frames are letterboxed to it and detections "
+                             "stay in source coordinates (defaults to inference_size from the config, then 640)")
+    parser.add_argument("--max-frames", type=int, default=0, help="Stop after this many frames (0 = until the source ends)")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between progress reports")
+    return parser.parse_args(argv)
+
+
+def resolve_preset_path(preset):
+    if os.path.exists(preset):
+        return preset
+    return os.path.join("presets", f"{preset}.json")
+
+
+def resolve_source(source, settings):
+    if source is None:
+        if settings.get('use_webcam'):
+            return 0, True
+        source = settings.get('video_path')
+        if not source or not str(source).strip():
+            return None, False
+    if str(source).isdigit():
+        return int(source), True
+    return source, False
+
+
+def camera_specs(sources, settings):
+    # Returns (camera_id, source, is_live, settings) for every camera to run.
+    # A "cameras" list in the config may override settings such as the
+    # restricted area per camera.
+    specs = []
+    if sources:
+        for index, source in enumerate(sources):
+            source, is_live = resolve_source(source, settings)
+            specs.append((f"cam{index}", source, is_live, settings))
+    elif settings.get('cameras'):
+        for index, camera in enumerate(settings['cameras']):
+            camera_settings = dict(settings)
+            camera_settings.update(camera)
+            source, is_live = resolve_source(str(camera.get('source', '')) or None, camera_settings)
+            specs.append((camera.get('id', f"cam{index}"), source, is_live, camera_settings))
+    else:
+        source, is_live = resolve_source(None, settings)
+        specs.append(("cam0", source, is_live, settings))
+    return specs
+
+
+def load_settings(args):
+    # Config file, then preset, then the command line options
+    settings = {}
+    if args.config and os.path.exists(args.config):
+        settings.update(load_config_file(args.config))
+    if args.preset:
+        settings.update(load_config_file(resolve_preset_path(args.preset)))
+
+    if args.adaptive_skip:
+        settings['adaptive_skip_enabled'] = True
+    if args.target_fps:
+        settings['target_fps'] = args.target_fps
+    if args.motion_gate:
+        settings['motion_gate_enabled'] = True
+    if args.roi_inference:
+        settings['roi_inference_enabled'] = True
+    if args.tiles:
+        settings['tiled_inference_enabled'] = True
+    if args.keyframe_interval:
+        settings['keyframe_interval'] = args.keyframe_interval
+    if args.inference_size:
+        settings['inference_size'] = args.inference_size
+    return settings
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    settings = load_settings(args)
+    specs = camera_specs(args.source, settings)
+    if any(source is None for _, source, _, _ in specs):
+        print("Error: No video source selected. Use --source or set video_path in the config.")
+        return 2
+
+    # One model shared by every camera; each camera has its own tracker and recording state
+    runner = MultiCameraEngine(db_path=args.db, recordings_folder=args.recordings)
+    for camera_id, source, is_live, camera_settings in specs:
+        cap = open_capture(source, is_live)
+        if not cap.isOpened():
+            print(f"Error: Unable to open video source {source}.")
+            runner.stop()
+            return 1
+        runner.add_camera(camera_id, cap, is_live, camera_settings)
+
+    try:
+        runner.load_yolo_model(args.backend or settings.get('model_backend') or DEFAULT_BACKEND,
+                               args.weights or settings.get('model_weights'),
+                               args.model_repo or settings.get('model_repo'),
+                               WARMUP_SIZE,
+                               optimization=args.optimize or settings.get('model_optimization') or 'none',
+                               input_size=settings.get('inference_size') or 640)
+    except Exception as e:
+        print(f"Failed to load YOLOv5 model: {str(e)}")
+        runner.stop()
+        return 1
+
+    stopping = []
+    signal.signal(signal.SIGINT, lambda signum, frame: stopping.append(signum))
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    runner.start()
+    start_time = time.perf_counter()
+    last_report = start_time
+    try:
+        while not stopping and runner.is_running():
+            # No display: skip drawing the boxes
+            runner.step(annotate=False)
+
+            if args.max_frames and runner.frames_processed >= args.max_frames:
+                break
+
+            now = time.perf_counter()
+            if now - last_report >= args.stats_interval:
+                gated_fraction, cpu_saved = runner.motion_stats()
+                print(f"Cameras: {len(runner.cameras)}, frames: {runner.frames_processed} processed in "
+                      f"{runner.batches} batches, {runner.frames_processed / (now - start_time):.1f} FPS, "
+                      f"last batch {runner.last_batch_time * 1000:.1f} ms, "
+                      f"motion gate skipped {gated_fraction:.0%} of frames ({cpu_saved:.1f} s detector time saved)"
+                      f"{runner.skip_summary()}")
+                last_report = now
+    finally:
+        runner.stop()
+
+    elapsed = time.perf_counter() - start_time
+    gated_fraction, cpu_saved = runner.motion_stats()
+    print(f"Finished: {runner.frames_processed} frames processed in {elapsed:.1f} seconds, "
+          f"motion gate skipped {gated_fraction:.0%} of frames ({cpu_saved:.1f} s detector time saved)")
+    roi_fraction = runner.roi_stats()
+    if roi_fraction is not None:
+        print(f"Zone-only detection: detector saw {roi_fraction:.0%} of the frame pixels")
+    frames_tiled, tiles_per_frame = runner.tile_stats()
+    if frames_tiled:
+        print(f"Tiled detection: {frames_tiled} frames run as {tiles_per_frame:.0f} tiles each")
+    keyframe_fraction, propagated, boxes_lost = runner.keyframe_stats()
+    if propagated:
+        print(f"Keyframes: detector ran on {keyframe_fraction:.0%} of frames, {propagated} frames carried by optical flow, "
+              f"{boxes_lost} boxes lost by the flow")
+    if runner.cold_start_time is not None:
+        print(f"Cold start: {runner.cold_start_time:.2f} seconds to the first frame through the model")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import time
+
+import cv2
+import numpy as np
+
+from detections import XMIN, YMIN, XMAX, YMAX, empty_detections
+
+GRID = 5  # Points per box side tracked with optical flow
+WINDOW = (15, 15)
+LEVELS = 2
+
+
+class KeyframePropagator:
+    # Runs the detector on keyframes only and carries its boxes across the
+    # frames in between with sparse Lucas-Kanade optical flow, so the anomaly
+    # checks and the overlay still get a box per object on every frame.
+    #
+    # Each box is seeded with a GRID x GRID lattice of points. A point counts
+    # only when flowing it back lands within max_error pixels of where it
+    # started; the box moves by the median shift of those points and scales
+    # by the median change of their spread. A box that keeps too few points
+    # falls back to its last velocity and makes the next frame a keyframe, as
+    # does a box whose size drifted more than max_scale from the keyframe.
+    def __init__(self, interval=5, width=640, min_points=0.5, max_error=1.0, max_scale=1.5):
+        self.interval = interval  # Detector runs at least every `interval` frames
+        self.width = width  # Flow runs on a copy downscaled to this width
+        self.min_points = min_points  # Fraction of a box's points that must survive
+        self.max_error = max_error  # Forward-backward error in downscaled pixels
+        self.max_scale = max_scale
+        self.previous = None
+        self.scale = 1.0
+        self.detections = empty_detections()
+        self.velocities = np.zeros((0, 2), dtype=np.float32)
+        self.keyframe_sizes = np.zeros((0, 2), dtype=np.float32)
+        self.frames_since_keyframe = 0
+        self.uncertain = False
+
+        self.keyframes = 0
+        self.frames_propagated = 0
+        self.boxes_lost = 0  # Boxes whose points the flow lost; each forces a keyframe
+        self.propagate_time = 0.0
+
+    @property
+    def active(self):
+        return self.previous is not None
+
+    def reset(self):
+        self.previous = None
+        self.detections = empty_detections()
+        self.velocities = np.zeros((0, 2), dtype=np.float32)
+        self.frames_since_keyframe = 0
+        self.uncertain = False
+
+    def due(self):
+        # True when the next frame has to go through the detector
+        return (self.previous is None or self.uncertain or
+                self.frames_since_keyframe + 1 >= self.interval)
+
+    def gray(self, frame):
+        height, width = frame.shape[:2]
+        self.scale = min(1.0, self.width / width)
+        if self.scale < 1.0:
+            frame = cv2.resize(frame, (self.width, max(1, round(height * self.scale))), interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+
+    def start(self, frame, detections):
+        previous, velocities = self.detections, self.velocities
+        self.previous = self.gray(frame)
+        self.detections = detections.copy()
+        self.velocities = np.zeros((len(detections), 2), dtype=np.float32)
+        self.keyframe_sizes = detections[:, [XMAX, YMAX]] - detections[:, [XMIN, YMIN]]
+        if len(previous) and len(detections):
+            # Boxes close to one carried over from the last frame keep its velocity
+            centers = (detections[:, [XMIN, YMIN]] + detections[:, [XMAX, YMAX]]) / 2
+            old = (previous[:, [XMIN, YMIN]] + previous[:, [XMAX, YMAX]]) / 2
+            distances = np.linalg.norm(centers[:, None] - old[None], axis=2)
+            nearest = distances.argmin(axis=1)
+            sizes = np.linalg.norm(detections[:, [XMAX, YMAX]] - detections[:, [XMIN, YMIN]], axis=1)
+            close = distances[np.arange(len(detections)), nearest] < sizes / 2
+            self.velocities[close] = velocities[nearest[close]]
+        self.frames_since_keyframe = 0
+        self.uncertain = False
+        self.keyframes += 1
+
+    def seed_points(self, boxes):
+        # GRID x GRID points over the middle 60% of each box, in downscaled pixels
+        steps = np.linspace(0.2, 0.8, GRID)
+        fx, fy = np.meshgrid(steps, steps)
+        fx, fy = fx.ravel(), fy.ravel()
+        x = boxes[:, None, 0] + fx[None] * (boxes[:, None, 2] - boxes[:, None, 0])
+        y = boxes[:, None, 1] + fy[None] * (boxes[:, None, 3] - boxes[:, None, 1])
+        return np.stack((x, y), axis=2).astype(np.float32)
+
+    def propagate(self, frame):
+        start = time.perf_counter()
+        current = self.gray(frame)
+        detections = self.detections.copy()
+        self.frames_since_keyframe += 1
+        self.frames_propagated += 1
+        if len(detections) and self.previous.shape == current.shape:
+            boxes = detections[:, [XMIN, YMIN, XMAX, YMAX]] * self.scale
+            points = self.seed_points(boxes)
+            flat = points.reshape(-1, 1, 2)
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.previous, current, flat, None,
+                                                        winSize=WINDOW, maxLevel=LEVELS)
+            back, back_status, _ = cv2.calcOpticalFlowPyrLK(current, self.previous, moved, None,
+                                                            winSize=WINDOW, maxLevel=LEVELS)
+            error = np.linalg.norm(back - flat, axis=2).reshape(len(boxes), -1)
+            good = (status.reshape(len(boxes), -1) == 1) & (back_status.reshape(len(boxes), -1) == 1) & \
+                   (error < self.max_error)
+            moved = moved.reshape(points.shape)
+
+            tracked = good.sum(axis=1) >= max(3, self.min_points * GRID * GRID)
+            for i in np.flatnonzero(tracked):
+                before, after = points[i][good[i]], moved[i][good[i]]
+                shift = np.median(after - before, axis=0)
+                spread_before = np.median(np.abs(before - np.median(before, axis=0)), axis=0)
+                spread_after = np.median(np.abs(after - np.median(after, axis=0)), axis=0)
+                ratio = np.clip(spread_after / np.maximum(spread_before, 1e-3), 0.9, 1.1)
+                center = (boxes[i, :2] + boxes[i, 2:]) / 2 + shift
+                half = (boxes[i, 2:] - boxes[i, :2]) / 2 * ratio
+                boxes[i] = np.concatenate((center - half, center + half))
+                self.velocities[i] = shift / self.scale
+
+            lost = ~tracked
+            if lost.any():
+                # Constant-velocity guess for this frame; the detector takes over on the next
+                boxes[lost] += np.tile(self.velocities[lost] * self.scale, 2)
+                self.boxes_lost += int(lost.sum())
+                self.uncertain = True
+
+            height, width = frame.shape[:2]
+            boxes /= self.scale
+            growth = (boxes[:, 2:] - boxes[:, :2]) / np.maximum(self.keyframe_sizes, 1.0)
+            if ((growth > self.max_scale) | (growth < 1 / self.max_scale)).any():
+                self.uncertain = True
+            detections[:, [XMIN, XMAX]] = boxes[:, [0, 2]].clip(0, width)
+            detections[:, [YMIN, YMAX]] = boxes[:, [1, 3]].clip(0, height)
+        self.previous = current
+        self.detections = detections
+        self.propagate_time += time.perf_counter() - start
+        return detections.copy()
+
+    @property
+    def keyframe_fraction(self):
+        total = self.keyframes + self.frames_propagated
+        return self.keyframes / total if total else 0.0
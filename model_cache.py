@@ -0,0 +1,64 @@
+import hashlib
+import json
+import os
+
+# Optimized models are built once and kept under models/cache, keyed by the
+# source file's hash and the build options, so later startups just load them
+OPTIMIZATIONS = ('none', 'torchscript', 'int8')
+CACHE_DIR = os.path.join('models', 'cache')
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(source, optimization, options, extension, cache_dir=CACHE_DIR):
+    key = json.dumps({'source': file_hash(source), 'optimization': optimization, **options}, sort_keys=True)
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(cache_dir, f"{stem}-{optimization}-{hashlib.sha256(key.encode()).hexdigest()[:16]}{extension}")
+
+
+def cached_artifact(source, optimization, options, extension, build, cache_dir=CACHE_DIR):
+    # build(source, target) writes the optimized model; it only runs on a cache miss
+    target = cache_path(source, optimization, options, extension, cache_dir)
+    if os.path.exists(target):
+        return target
+    os.makedirs(cache_dir, exist_ok=True)
+    print(f"Building {optimization} model from {source} (cached as {target})")
+    partial = target + '.partial'
+    build(source, partial)
+    os.replace(partial, target)  # A crash mid-build never leaves a broken cache entry
+    return target
+
+
+def trace_torchscript(hub_model, target, input_size):
+    # Trace the bare YOLOv5 network at a fixed square input, freeze it and save
+    # it with the class names; the caller letterboxes and runs NMS itself
+    import torch
+
+    network = hub_model.model.model if hasattr(hub_model.model, 'model') else hub_model.model
+    network = network.float().eval()
+    for module in network.modules():
+        if type(module).__name__ == 'Detect':
+            module.inplace = False
+            module.dynamic = False
+            module.export = True  # Return only the (1, boxes, 5 + classes) tensor
+    example = torch.zeros(1, 3, input_size, input_size)
+    with torch.no_grad():
+        traced = torch.jit.trace(network, example, strict=False)
+        traced = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+    names = getattr(hub_model, 'names', None) or {}
+    if not isinstance(names, dict):
+        names = dict(enumerate(names))
+    torch.jit.save(traced, target, _extra_files={'names.json': json.dumps(names)})
+
+
+def quantize_onnx(source, target):
+    # Dynamic INT8: weights stored as int8, activations quantized on the fly, no calibration data needed
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
@@ -0,0 +1,118 @@
+import csv
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from backends import DEFAULT_BACKEND, create_backend
+
+IMPORT_TIME = time.time()
+
+WARMUP_SIZE = (640, 480)
+
+# cold_start_s runs from process start, so in the GUI it includes the time
+# until a source is picked; source_to_frame_s runs from opening the source
+METRICS_HEADER = ['timestamp', 'cold_start_s', 'model_load_s', 'warmup_s', 'backend', 'weights', 'source_to_frame_s']
+
+
+def process_start_time():
+    # Wall-clock time at which this process was started; on systems without
+    # /proc the time this module was imported is the closest we have
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return IMPORT_TIME
+
+
+def warm_up(model, size=WARMUP_SIZE, batch=1, runs=2):
+    # The first inferences pay for CUDA/cuDNN setup and allocator growth; take
+    # that hit here instead of on the first real frame
+    width, height = size
+    frames = [np.zeros((height, width, 3), dtype=np.uint8) for _ in range(batch)]
+    for _ in range(runs):
+        model.detect(frames)
+
+
+def log_startup_metrics(path, cold_start_time, load_time, warmup_time, backend, weights, source_time=None):
+    # One row per run so cold-start regressions show up over time
+    is_new = not os.path.exists(path)
+    if not is_new:
+        with open(path, newline='') as f:
+            rows = list(csv.reader(f))
+        if rows and rows[0] != METRICS_HEADER:
+            # Written before source_to_frame_s existed; those rows leave it empty
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerows([METRICS_HEADER] + [row + [''] for row in rows[1:]])
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f)
+        if is_new:
+            writer.writerow(METRICS_HEADER)
+        writer.writerow([datetime.now().isoformat(), f"{cold_start_time:.3f}",
+                         f"{load_time:.3f}", f"{warmup_time:.3f}", backend, weights,
+                         f"{source_time:.3f}" if source_time is not None else ''])
+
+
+def report_cold_start(loader, metrics_path=None, source_start=None):
+    # Process start to the first frame that went through the model, and
+    # source_start (time.time() of opening the source) to that frame
+    cold_start_time = time.time() - process_start_time()
+    source_time = time.time() - source_start if source_start is not None else None
+    load_time = loader.load_time if loader is not None else 0.0
+    warmup_time = loader.warmup_time if loader is not None else 0.0
+    model = loader.model if loader is not None else None
+    backend = getattr(model, 'name', '')
+    weights = getattr(model, 'weights', '')
+    source = f", {source_time:.2f} s after the source opened" if source_time is not None else ""
+    print(f"Cold start: first frame through the model {cold_start_time:.2f} s after process start{source} "
+          f"({backend} model load {load_time:.2f} s, warm-up {warmup_time:.2f} s)")
+    if metrics_path:
+        try:
+            log_startup_metrics(metrics_path, cold_start_time, load_time, warmup_time, backend, weights, source_time)
+        except OSError as e:
+            print(f"Failed to write startup metrics: {str(e)}")
+    return cold_start_time
+
+
+class ModelLoader(threading.Thread):
+    # Loads and warms up the model off the UI thread; on_loaded(model) or
+    # on_error(exception) is called from this thread when it is done
+    def __init__(self, backend=DEFAULT_BACKEND, weights=None, repo_dir=None, warmup_size=WARMUP_SIZE,
+                 warmup_batch=1, on_loaded=None, on_error=None, optimization='none', input_size=640):
+        super().__init__(daemon=True)
+        self.backend = backend
+        self.optimization = optimization
+        self.input_size = input_size
+        self.weights = weights
+        self.repo_dir = repo_dir
+        self.warmup_size = warmup_size
+        self.warmup_batch = warmup_batch
+        self.on_loaded = on_loaded
+        self.on_error = on_error
+        self.model = None
+        self.error = None
+        self.load_time = 0.0
+        self.warmup_time = 0.0
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+            model = create_backend(self.backend, self.weights, self.repo_dir, self.input_size, self.optimization)
+            self.load_time = time.perf_counter() - start
+            start = time.perf_counter()
+            warm_up(model, self.warmup_size, self.warmup_batch)
+            self.warmup_time = time.perf_counter() - start
+            self.model = model
+        except Exception as e:
+            self.error = e
+            if self.on_error is not None:
+                self.on_error(e)
+            return
+        print(f"Model loaded ({model.name}) in {self.load_time:.2f} s, warm-up {self.warmup_time:.2f} s")
+        if self.on_loaded is not None:
+            self.on_loaded(model)
@@ -0,0 +1,79 @@
+import time
+
+import cv2
+import numpy as np
+
+MOTION_METHODS = ('mog2', 'difference')
+
+
+class MotionGate:
+    # Decides per frame whether the detector has to run. The frame is shrunk
+    # to a small grayscale image and compared with a background model (MOG2)
+    # or with the previous frame; when too few pixels changed the scene is
+    # static and the previous detections still hold.
+    #
+    # After motion stops the detector keeps running for hold_frames so the
+    # last detections describe the settled scene, and it runs at least every
+    # max_gated_frames so slow changes are never missed for long.
+    def __init__(self, method='mog2', width=160, threshold=0.002, hold_frames=10, max_gated_frames=50):
+        if method not in MOTION_METHODS:
+            raise ValueError(f"Unknown motion method '{method}', expected one of {', '.join(MOTION_METHODS)}")
+        self.method = method
+        self.width = width
+        self.threshold = threshold  # Fraction of changed pixels that counts as motion
+        self.hold_frames = hold_frames
+        self.max_gated_frames = max_gated_frames
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=16, detectShadows=False)
+        self.previous = None
+        self.frames_since_motion = hold_frames + 1
+        self.gated_in_a_row = 0
+
+        self.frames_checked = 0
+        self.frames_gated = 0
+        self.gate_time = 0.0
+        self.detect_time = 0.0  # Running average of one detector call, for the CPU-saved estimate
+        self.last_motion = 0.0
+
+    def motion_fraction(self, frame):
+        height, width = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, height * self.width // width)), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_RGB2GRAY), (5, 5), 0)
+        if self.method == 'mog2':
+            mask = self.subtractor.apply(gray)
+        else:
+            if self.previous is None or self.previous.shape != gray.shape:
+                self.previous = gray
+                return 1.0
+            mask = cv2.threshold(cv2.absdiff(gray, self.previous), 25, 255, cv2.THRESH_BINARY)[1]
+            self.previous = gray
+        return np.count_nonzero(mask) / mask.size
+
+    def should_detect(self, frame):
+        start = time.perf_counter()
+        self.frames_checked += 1
+        self.last_motion = self.motion_fraction(frame)
+        if self.last_motion >= self.threshold:
+            self.frames_since_motion = 0
+        else:
+            self.frames_since_motion += 1
+
+        detect = self.frames_since_motion <= self.hold_frames or self.gated_in_a_row >= self.max_gated_frames
+        if detect:
+            self.gated_in_a_row = 0
+        else:
+            self.gated_in_a_row += 1
+            self.frames_gated += 1
+        self.gate_time += time.perf_counter() - start
+        return detect
+
+    def observe_detection(self, seconds):
+        self.detect_time = seconds if not self.detect_time else 0.9 * self.detect_time + 0.1 * seconds
+
+    @property
+    def gated_fraction(self):
+        return self.frames_gated / self.frames_checked if self.frames_checked else 0.0
+
+    @property
+    def cpu_saved(self):
+        # Detector time not spent on gated frames, minus what the gate itself cost
+        return self.frames_gated * self.detect_time - self.gate_time
@@ -0,0 +1,179 @@
+import queue
+import smtplib
+import threading
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+
+class NotificationDispatcher(threading.Thread):
+    # Sends alert emails from a background thread so the video loop never waits
+    # on SMTP.
+    #
+    # Every alert has a type ('anomaly', 'detection_threshold', ...). The first
+    # alert of a type is sent right away; alerts of the same type that arrive
+    # within its rate limit are coalesced into a single summary mail sent when
+    # the limit has passed. One SMTP connection is kept open and reused, and a
+    # failed send is retried with exponential backoff before it is given up.
+    def __init__(self, email_settings, rate_limits=None, default_rate_limit=60.0,
+                 max_retries=3, retry_backoff=2.0, idle_timeout=60.0, max_pending=1000):
+        super().__init__(daemon=True)
+        # Both dicts are read on every send, so changes from the options window apply immediately
+        self.email_settings = email_settings
+        self.rate_limits = rate_limits if rate_limits is not None else {}
+        self.default_rate_limit = default_rate_limit
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        self.incoming = queue.Queue(maxsize=max_pending)
+        self.stop_event = threading.Event()
+
+        self.pending = {}    # alert type -> coalesced alert waiting for its rate limit
+        self.last_sent = {}  # alert type -> time of the last mail
+        self.server = None
+        self.server_key = None
+        self.last_used = 0.0
+
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.retries = 0
+        self.connections = 0
+        self.last_send_time = 0.0
+
+    def notify(self, alert_type, subject, body):
+        # Called from the processing thread; never blocks
+        try:
+            self.incoming.put_nowait((alert_type, subject, body, time.monotonic()))
+        except queue.Full:
+            self.dropped += 1
+
+    def is_configured(self):
+        settings = self.email_settings
+        if not settings.get('sender_email') or not settings.get('recipient_email'):
+            return False
+        # Without TLS (e.g. a local relay) there is no login, so no password is needed
+        return bool(settings.get('sender_password')) or not settings.get('use_tls', True)
+
+    def rate_limit(self, alert_type):
+        return float(self.rate_limits.get(alert_type, self.default_rate_limit))
+
+    def add(self, alert_type, subject, body, created):
+        alert = self.pending.get(alert_type)
+        if alert is None:
+            self.pending[alert_type] = {'subject': subject, 'body': body, 'count': 1, 'first': created}
+        else:
+            alert['subject'] = subject
+            alert['body'] = body
+            alert['count'] += 1
+            self.coalesced += 1
+
+    def due_time(self, alert_type):
+        last_sent = self.last_sent.get(alert_type)
+        if last_sent is None:
+            return 0.0
+        return last_sent + self.rate_limit(alert_type)
+
+    def next_wakeup(self):
+        now = time.monotonic()
+        times = [self.due_time(alert_type) for alert_type in self.pending]
+        if self.server is not None:
+            times.append(self.last_used + self.idle_timeout)
+        if not times:
+            return 0.5
+        return min(max(0.0, min(times) - now), 0.5)
+
+    def compose(self, alert):
+        body = alert['body']
+        if alert['count'] > 1:
+            elapsed = time.monotonic() - alert['first']
+            body = f"{body}\n\n({alert['count']} similar alerts in the last {elapsed:.0f} seconds)"
+        msg = MIMEMultipart()
+        msg['From'] = self.email_settings['sender_email']
+        msg['To'] = self.email_settings['recipient_email']
+        msg['Subject'] = alert['subject']
+        msg.attach(MIMEText(body, 'plain'))
+        return msg.as_string()
+
+    def connection(self):
+        settings = self.email_settings
+        key = (settings['smtp_server'], int(settings['smtp_port']), settings['sender_email'],
+               settings.get('sender_password'), settings.get('use_tls', True))
+        if self.server is not None and key != self.server_key:
+            self.disconnect()
+        if self.server is None:
+            server = smtplib.SMTP(settings['smtp_server'], int(settings['smtp_port']), timeout=10)
+            if settings.get('use_tls', True):
+                server.starttls()
+                server.login(settings['sender_email'], settings['sender_password'])
+            self.server = server
+            self.server_key = key
+            self.connections += 1
+        return self.server
+
+    def disconnect(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except (smtplib.SMTPException, OSError):
+            self.server.close()
+        self.server = None
+
+    def send(self, message):
+        for attempt in range(self.max_retries + 1):
+            try:
+                start = time.perf_counter()
+                self.connection().sendmail(self.email_settings['sender_email'],
+                                           self.email_settings['recipient_email'], message)
+                self.last_used = time.monotonic()
+                self.last_send_time = time.perf_counter() - start
+                return True
+            except (smtplib.SMTPException, OSError) as e:
+                # A dropped or broken connection is opened again on the next attempt
+                if self.server is not None:
+                    self.server.close()
+                    self.server = None
+                if attempt == self.max_retries or self.stop_event.is_set():
+                    print(f"Failed to send email notification: {str(e)}")
+                    return False
+                self.retries += 1
+                self.stop_event.wait(self.retry_backoff * 2 ** attempt)
+        return False
+
+    def dispatch_due(self):
+        now = time.monotonic()
+        for alert_type in list(self.pending):
+            if now < self.due_time(alert_type):
+                continue
+            alert = self.pending.pop(alert_type)
+            if not self.is_configured():
+                print("Email settings not configured. Skipping notification.")
+            elif self.send(self.compose(alert)):
+                self.sent += 1
+                print("Email notification sent successfully")
+            else:
+                self.failed += 1
+            self.last_sent[alert_type] = time.monotonic()
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    self.add(*self.incoming.get(timeout=self.next_wakeup()))
+                    # Take everything that queued up meanwhile before sending
+                    while True:
+                        self.add(*self.incoming.get_nowait())
+                except queue.Empty:
+                    pass
+                self.dispatch_due()
+                if self.server is not None and time.monotonic() - self.last_used > self.idle_timeout:
+                    self.disconnect()
+        finally:
+            self.disconnect()
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
@@ -0,0 +1,29 @@
+import numpy as np
+
+from engine import DetectionEngine
+
+
+class NamesOnly:
+    names = {0: 'person'}
+
+
+def test_roi_crop_keeps_one_box_for_an_object_on_the_crop_edge(tmp_path):
+    engine = DetectionEngine(str(tmp_path / "test.db"), str(tmp_path / "recordings"))
+    try:
+        engine.model = NamesOnly()
+        engine.detection_classes = ['person']
+        engine.roi_crop = (100, 100, 300, 300)
+
+        # Full-frame pass: the person's center is just right of the crop
+        full_frame = np.array([[280, 150, 360, 250, 0.9, 0],
+                               [500, 400, 560, 520, 0.8, 0]], dtype=np.float32)
+        engine.finish_detections(full_frame, None)
+        assert len(engine.outside_detections) == 2
+
+        # Crop pass finds the part of the same person inside the crop (crop pixels)
+        crop = np.array([[180, 50, 200, 150, 0.7, 0]], dtype=np.float32)
+        detections = engine.finish_detections(crop, engine.roi_crop)
+        assert len(detections) == 2
+        assert detections[:, 0].tolist() == [280, 500]
+    finally:
+        engine.close()
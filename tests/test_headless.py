@@ -0,0 +1,21 @@
+import numpy as np
+
+import headless
+from engine import DetectionEngine
+
+
+def test_inference_size_reaches_the_engine(tmp_path):
+    args = headless.parse_args(["--source", "video.mp4", "--config", str(tmp_path / "missing.yaml"),
+                                "--inference-size", "416", "--tiles"])
+    settings = headless.load_settings(args)
+    _, _, _, camera_settings = headless.camera_specs(args.source, settings)[0]
+
+    engine = DetectionEngine(str(tmp_path / "test.db"), str(tmp_path / "recordings"))
+    try:
+        engine.apply_settings(camera_settings)
+        assert engine.inference_size == 416
+        # Tiles default to the inference size
+        engine.use_tiles(np.zeros((720, 1280, 3), dtype=np.uint8))
+        assert engine.tiler.tile_size == 416
+    finally:
+        engine.close()
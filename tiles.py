@@ -0,0 +1,108 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from detections import XMIN, YMIN, XMAX, YMAX, CONF, CLS, empty_detections
+
+
+def tile_grid(width, height, tile_size, overlap):
+    # (x1, y1, x2, y2) tiles of tile_size pixels covering the frame, neighbours
+    # sharing at least `overlap` of a tile so objects on a seam are whole in one
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        count = int(np.ceil((length - tile_size) / (tile_size * (1 - overlap)))) + 1
+        return np.linspace(0, length - tile_size, count).round().astype(int).tolist()
+    return [(x, y, min(width, x + tile_size), min(height, y + tile_size))
+            for y in starts(height) for x in starts(width)]
+
+
+def merge_detections(detections, iou_threshold=0.5, ios_threshold=0.6):
+    # Class-aware greedy NMS across tiles. Besides IoU, a box mostly inside a
+    # higher-scoring one of the same class (intersection over the smaller box)
+    # is dropped, which removes the partial copies cut off at tile edges.
+    if not len(detections):
+        return detections
+    detections = detections[np.argsort(-detections[:, CONF], kind='stable')]
+    boxes = detections[:, [XMIN, YMIN, XMAX, YMAX]].astype(np.float64)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    suppressed = np.zeros(len(detections), dtype=bool)
+    keep = []
+    for i in range(len(detections)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        rest = np.arange(i + 1, len(detections))
+        rest = rest[~suppressed[rest] & (detections[rest, CLS] == detections[i, CLS])]
+        if not len(rest):
+            continue
+        width = np.clip(np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0]), 0, None)
+        height = np.clip(np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1]), 0, None)
+        intersection = width * height
+        iou = intersection / np.maximum(areas[i] + areas[rest] - intersection, 1e-9)
+        ios = intersection / np.maximum(np.minimum(areas[i], areas[rest]), 1e-9)
+        suppressed[rest[(iou > iou_threshold) | (ios > ios_threshold)]] = True
+    return detections[keep]
+
+
+class TiledDetector:
+    # Splits a large frame into overlapping tile_size tiles and runs them
+    # through the model as one batch (or `workers` batches in parallel), plus
+    # one downscaled full-frame pass for objects bigger than a tile. Tile boxes
+    # are shifted back to frame pixels and merged with merge_detections.
+    def __init__(self, tile_size=640, overlap=0.2, full_frame=True, workers=0, min_scale=1.5):
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.full_frame = full_frame
+        self.workers = workers
+        self.min_scale = min_scale  # Frames smaller than min_scale * tile_size are not tiled
+        self.pool = None
+        self.pool_workers = 0
+        self.frames_tiled = 0
+        self.tiles_run = 0
+
+    def needs_tiling(self, frame):
+        return max(frame.shape[:2]) >= self.min_scale * self.tile_size
+
+    def run_batches(self, model, images, size):
+        if self.workers <= 1 or len(images) < 2:
+            return model.detect(images, size)
+        if self.pool is None or self.pool_workers != self.workers:
+            self.close()
+            self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix='tiles')
+            self.pool_workers = self.workers
+        chunks = [images[i::self.workers] for i in range(self.workers)]
+        futures = [self.pool.submit(model.detect, chunk, size) for chunk in chunks if chunk]
+        chunk_results = [future.result() for future in futures]
+        # Undo the round-robin split so results line up with the images again
+        results = [None] * len(images)
+        for offset, chunk in enumerate(chunk_results):
+            results[offset::self.workers] = chunk
+        return results
+
+    def detect(self, model, frame):
+        height, width = frame.shape[:2]
+        regions = tile_grid(width, height, self.tile_size, self.overlap)
+        size = self.tile_size if getattr(model, 'resizable', False) else None
+        images = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in regions]
+        if self.full_frame:
+            images.append(frame)  # Letterboxed down to the tile size with the rest of the batch
+        results = self.run_batches(model, images, size)
+        self.frames_tiled += 1
+        self.tiles_run += len(regions)
+
+        merged = [results[-1]] if self.full_frame else []
+        for (x1, y1, _, _), detections in zip(regions, results):
+            if len(detections):
+                detections = detections.copy()
+                detections[:, [XMIN, XMAX]] += x1
+                detections[:, [YMIN, YMAX]] += y1
+                merged.append(detections)
+        if not merged:
+            return empty_detections()
+        return merge_detections(np.concatenate(merged).astype(np.float32))
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
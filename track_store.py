@@ -0,0 +1,108 @@
+import numpy as np
+
+
+class TrackStore:
+    # Per-track state as a struct of preallocated NumPy columns, one slot per
+    # live track. Slots of dropped tracks go back on a free list and are
+    # reused, and each slot keeps its last `history` boxes in a ring, so
+    # memory follows the most tracks ever alive at once times the history
+    # length, not the number of objects seen since start.
+    #
+    # Track ids map to slots through a small sorted index of the live tracks,
+    # looked up with searchsorted for a whole frame at once.
+    def __init__(self, capacity=64, history=30):
+        self.history = history
+        self.capacity = 0
+        self.ids = np.zeros(0, dtype=np.int64)  # -1 marks a free slot
+        self.classes = np.zeros(0, dtype=np.float32)
+        self.first_seen = np.zeros(0, dtype=np.int64)  # Frame numbers
+        self.last_seen = np.zeros(0, dtype=np.int64)
+        self.zone_entered = np.zeros(0)  # time.time() of entering the restricted area, nan outside
+        self.loitering_start = np.zeros(0)
+        self.positions = np.zeros((0, history, 4), dtype=np.float32)  # Box rings
+        self.position_count = np.zeros(0, dtype=np.int64)  # Boxes ever written per slot
+        self.free = np.zeros(0, dtype=np.int64)  # Stack of free slots, lowest on top
+        self.index_ids = np.zeros(0, dtype=np.int64)  # Live ids, sorted
+        self.index_slots = np.zeros(0, dtype=np.int64)
+        self.grow(capacity)
+
+    def __len__(self):
+        return len(self.index_ids)
+
+    def grow(self, capacity):
+        # Doubles (at least) the columns; only happens when every slot is taken
+        extra = capacity - self.capacity
+        self.ids = np.concatenate((self.ids, np.full(extra, -1, dtype=np.int64)))
+        self.classes = np.concatenate((self.classes, np.zeros(extra, dtype=np.float32)))
+        self.first_seen = np.concatenate((self.first_seen, np.zeros(extra, dtype=np.int64)))
+        self.last_seen = np.concatenate((self.last_seen, np.zeros(extra, dtype=np.int64)))
+        self.zone_entered = np.concatenate((self.zone_entered, np.full(extra, np.nan)))
+        self.loitering_start = np.concatenate((self.loitering_start, np.full(extra, np.nan)))
+        self.positions = np.concatenate((self.positions, np.zeros((extra, self.history, 4), dtype=np.float32)))
+        self.position_count = np.concatenate((self.position_count, np.zeros(extra, dtype=np.int64)))
+        self.free = np.concatenate((np.arange(capacity - 1, self.capacity - 1, -1), self.free))
+        self.capacity = capacity
+
+    def lookup(self, track_ids):
+        # Slot per id, -1 for ids without one
+        slots = np.full(len(track_ids), -1, dtype=np.int64)
+        if len(self.index_ids):
+            rows = np.minimum(np.searchsorted(self.index_ids, track_ids), len(self.index_ids) - 1)
+            found = self.index_ids[rows] == track_ids
+            slots[found] = self.index_slots[rows[found]]
+        return slots
+
+    def slots_for(self, track_ids, classes, frame_count):
+        # Slots of the given tracks, allocating fresh ones for new ids
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        slots = self.lookup(track_ids)
+        new = slots < 0
+        if new.any():
+            slots[new] = self.allocate(track_ids[new], classes[new], frame_count)
+        return slots
+
+    def allocate(self, track_ids, classes, frame_count):
+        count = len(track_ids)
+        if count > len(self.free):
+            self.grow(max(2 * self.capacity, self.capacity + count))
+        slots = self.free[len(self.free) - count:][::-1]
+        self.free = self.free[:len(self.free) - count]
+        self.ids[slots] = track_ids
+        self.classes[slots] = classes
+        self.first_seen[slots] = frame_count
+        self.last_seen[slots] = frame_count
+        self.zone_entered[slots] = np.nan
+        self.loitering_start[slots] = np.nan
+        self.position_count[slots] = 0
+        self.index_ids = np.concatenate((self.index_ids, track_ids))
+        self.index_slots = np.concatenate((self.index_slots, slots))
+        order = np.argsort(self.index_ids, kind='stable')
+        self.index_ids, self.index_slots = self.index_ids[order], self.index_slots[order]
+        return slots
+
+    def release(self, slots):
+        self.ids[slots] = -1
+        keep = ~np.isin(self.index_slots, slots)
+        self.index_ids, self.index_slots = self.index_ids[keep], self.index_slots[keep]
+        self.free = np.concatenate((self.free, np.sort(slots)[::-1]))
+
+    def live_slots(self):
+        return self.index_slots
+
+    def previous_boxes(self, slots):
+        # Last box written for each slot, nan for slots without one
+        count = self.position_count[slots]
+        boxes = self.positions[slots, (count - 1) % self.history].copy()
+        boxes[count == 0] = np.nan
+        return boxes
+
+    def push_boxes(self, slots, boxes):
+        self.positions[slots, self.position_count[slots] % self.history] = boxes
+        self.position_count[slots] += 1
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in (
+            self.ids, self.classes, self.first_seen, self.last_seen, self.zone_entered, self.loitering_start,
+            self.positions, self.position_count, self.free, self.index_ids, self.index_slots))
+
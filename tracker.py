@@ -0,0 +1,166 @@
+import numpy as np
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy comes with scikit-learn, but keep working without it
+    linear_sum_assignment = None
+
+from detections import XMIN, YMIN, XMAX, YMAX, CLS
+
+# Constant-velocity model over [cx, cy, w, h, vcx, vcy, vw, vh], one step per processed frame
+STATE_SIZE = 8
+MEASUREMENT_SIZE = 4
+TRANSITION = np.eye(STATE_SIZE)
+TRANSITION[:4, 4:] = np.eye(4)
+DIAGONAL = np.arange(STATE_SIZE)
+MEASUREMENT_DIAGONAL = np.arange(MEASUREMENT_SIZE)
+
+# Noise scales relative to the box size, so small and large objects behave alike
+POSITION_STD = 1.0 / 20
+VELOCITY_STD = 1.0 / 160
+
+
+def boxes_to_measurements(boxes):
+    widths = boxes[:, 2] - boxes[:, 0]
+    heights = boxes[:, 3] - boxes[:, 1]
+    return np.stack((boxes[:, 0] + widths / 2, boxes[:, 1] + heights / 2, widths, heights), axis=1)
+
+
+def states_to_boxes(states):
+    half_w = states[:, 2] / 2
+    half_h = states[:, 3] / 2
+    return np.stack((states[:, 0] - half_w, states[:, 1] - half_h,
+                     states[:, 0] + half_w, states[:, 1] + half_h), axis=1)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    overlap = np.clip(bottom_right - top_left, 0, None)
+    intersection = overlap[..., 0] * overlap[..., 1]
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+def assign(cost):
+    if linear_sum_assignment is not None:
+        return linear_sum_assignment(cost)
+    # Greedy fallback: cheapest pairs first
+    rows, cols = [], []
+    used_rows, used_cols = set(), set()
+    for flat in np.argsort(cost, axis=None):
+        row, col = divmod(int(flat), cost.shape[1])
+        if row not in used_rows and col not in used_cols:
+            rows.append(row)
+            cols.append(col)
+            used_rows.add(row)
+            used_cols.add(col)
+    return np.array(rows, dtype=int), np.array(cols, dtype=int)
+
+
+def noise_std(sizes, position_scale, velocity_scale):
+    # sizes: (n, 2) widths/heights -> (n, 8) standard deviations
+    w, h = sizes[:, 0:1], sizes[:, 1:2]
+    return np.hstack((position_scale * w, position_scale * h, position_scale * w, position_scale * h,
+                      velocity_scale * w, velocity_scale * h, velocity_scale * w, velocity_scale * h))
+
+
+class MultiObjectTracker:
+    # Kalman-filtered IoU tracker with optimal (Hungarian) assignment. All live
+    # tracks are kept as stacked arrays so predict/update are a few vectorized
+    # NumPy operations per frame; tracks unseen for max_age frames are dropped,
+    # so memory follows the number of live objects.
+    def __init__(self, iou_threshold=0.3, max_age=10):
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.next_id = 1
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.classes = np.zeros(0, dtype=np.float32)
+        self.states = np.zeros((0, STATE_SIZE))
+        self.covariances = np.zeros((0, STATE_SIZE, STATE_SIZE))
+        self.misses = np.zeros(0, dtype=np.int32)
+        self.removed_ids = []  # Ids dropped by the last update; per-track state elsewhere is freed with them
+
+    def __len__(self):
+        return len(self.ids)
+
+    def predict(self):
+        if not len(self.ids):
+            return
+        std = noise_std(np.abs(self.states[:, 2:4]), POSITION_STD, VELOCITY_STD)
+        self.states = self.states @ TRANSITION.T
+        self.covariances = TRANSITION @ self.covariances @ TRANSITION.T
+        self.covariances[:, DIAGONAL, DIAGONAL] += std ** 2
+
+    def predicted_boxes(self):
+        return states_to_boxes(self.states)
+
+    def correct(self, track_index, measurements):
+        states = self.states[track_index]
+        covariances = self.covariances[track_index]
+        std = noise_std(np.abs(measurements[:, 2:4]), POSITION_STD, VELOCITY_STD)[:, :MEASUREMENT_SIZE]
+
+        projected = covariances[:, :MEASUREMENT_SIZE, :MEASUREMENT_SIZE].copy()
+        projected[:, MEASUREMENT_DIAGONAL, MEASUREMENT_DIAGONAL] += std ** 2
+        cross = covariances[:, :, :MEASUREMENT_SIZE]
+        gain = np.linalg.solve(projected, cross.transpose(0, 2, 1)).transpose(0, 2, 1)
+
+        innovation = measurements - states[:, :MEASUREMENT_SIZE]
+        self.states[track_index] = states + np.einsum('nij,nj->ni', gain, innovation)
+        self.covariances[track_index] = covariances - gain @ covariances[:, :MEASUREMENT_SIZE, :]
+
+    def spawn(self, measurements, classes):
+        count = len(measurements)
+        states = np.hstack((measurements, np.zeros((count, 4))))
+        std = noise_std(np.abs(measurements[:, 2:4]), 2 * POSITION_STD, 10 * VELOCITY_STD)
+        covariances = np.zeros((count, STATE_SIZE, STATE_SIZE))
+        covariances[:, DIAGONAL, DIAGONAL] = std ** 2
+
+        new_ids = np.arange(self.next_id, self.next_id + count, dtype=np.int64)
+        self.next_id += count
+        self.ids = np.concatenate((self.ids, new_ids))
+        self.classes = np.concatenate((self.classes, classes))
+        self.states = np.concatenate((self.states, states))
+        self.covariances = np.concatenate((self.covariances, covariances))
+        self.misses = np.concatenate((self.misses, np.zeros(count, dtype=np.int32)))
+        return new_ids
+
+    def update(self, detections):
+        # Returns one track id per detection row, in the same order
+        self.predict()
+        track_ids = np.zeros(len(detections), dtype=np.int64)
+        boxes = detections[:, [XMIN, YMIN, XMAX, YMAX]].astype(np.float64)
+        measurements = boxes_to_measurements(boxes)
+        matched_tracks = np.zeros(0, dtype=int)
+        matched_detections = np.zeros(0, dtype=int)
+
+        if len(self.ids) and len(detections):
+            iou = iou_matrix(self.predicted_boxes(), boxes)
+            iou[self.classes[:, None] != detections[None, :, CLS]] = 0.0
+            rows, cols = assign(1.0 - iou)
+            keep = iou[rows, cols] >= self.iou_threshold
+            matched_tracks, matched_detections = rows[keep], cols[keep]
+
+        self.misses += 1
+        if len(matched_tracks):
+            self.correct(matched_tracks, measurements[matched_detections])
+            self.misses[matched_tracks] = 0
+            track_ids[matched_detections] = self.ids[matched_tracks]
+
+        unmatched = np.ones(len(detections), dtype=bool)
+        unmatched[matched_detections] = False
+        if unmatched.any():
+            track_ids[unmatched] = self.spawn(measurements[unmatched], detections[unmatched, CLS])
+
+        expired = self.misses > self.max_age
+        self.removed_ids = self.ids[expired].tolist()
+        if expired.any():
+            alive = ~expired
+            self.ids = self.ids[alive]
+            self.classes = self.classes[alive]
+            self.states = self.states[alive]
+            self.covariances = self.covariances[alive]
+            self.misses = self.misses[alive]
+        return track_ids